@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+ArtifactManager.save_artifacts over a synthetic tree of many small files
+plus a few large ones, serial (--io-workers 1) versus a thread pool.
+On a single-core host every run is serial, as ArtifactManager skips threads
+there.
+
+    python benchmarks/bench_artifact_save.py [small_files] [large_files] [large_mb]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scarycicd import ArtifactManager  # noqa: E402
+
+
+def build_tree(root, small_files, large_files, large_mb):
+    """Create dist/ with small files spread over 100 directories."""
+    dist = root / 'dist'
+    for i in range(small_files):
+        directory = dist / f"pkg{i % 100:02d}"
+        if i < 100:
+            directory.mkdir(parents=True)
+        (directory / f"mod{i}.py").write_bytes(os.urandom(512))
+    for i in range(large_files):
+        (dist / f"blob{i}.bin").write_bytes(os.urandom(large_mb * 1024 * 1024))
+
+
+def time_save(workspace, io_workers):
+    manager = ArtifactManager(workspace, io_workers=io_workers)
+    try:
+        start = time.perf_counter()
+        manager.save_artifacts('build', ['dist'])
+        return time.perf_counter() - start
+    finally:
+        manager.cleanup()
+
+
+def main():
+    small_files = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    large_files = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    large_mb = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workspace = Path(tmp)
+        build_tree(workspace, small_files, large_files, large_mb)
+
+        print(f"{small_files} x 512 B files + {large_files} x {large_mb} MB files")
+        for io_workers in (1, 4, 16):
+            duration = time_save(workspace, io_workers)
+            print(f"  io_workers={io_workers:<3} {duration:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
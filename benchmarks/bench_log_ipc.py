@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Log line throughput from a worker process to the coordinator.
+
+Compares one put per line on a Manager().Queue() (the old JobExecutor
+logger), the same queue fed by LogBatcher, and a plain multiprocessing
+Queue and Pipe, each per line and batched.
+
+    python benchmarks/bench_log_ipc.py [lines]
+"""
+
+import sys
+import time
+from multiprocessing import Manager, Pipe, Process, Queue
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scarycicd import LogBatcher  # noqa: E402
+
+BATCH = LogBatcher.MAX_LINES
+
+
+def produce_per_line(output_queue, lines):
+    for i in range(lines):
+        output_queue.put(f"[job] line {i}")
+    output_queue.put(None)
+
+
+def produce_batched(output_queue, lines):
+    log = LogBatcher(output_queue)
+    for i in range(lines):
+        log(f"[job] line {i}")
+    log.close()
+    output_queue.put(None)
+
+
+def produce_pipe(conn, lines, batch):
+    chunk = []
+    for i in range(lines):
+        chunk.append(f"[job] line {i}")
+        if len(chunk) >= batch:
+            conn.send(chunk)
+            chunk = []
+    if chunk:
+        conn.send(chunk)
+    conn.send(None)
+
+
+def consume_queue(output_queue):
+    received = 0
+    while True:
+        message = output_queue.get()
+        if message is None:
+            return received
+        received += len(message[1]) if isinstance(message, tuple) else 1
+
+
+def through_queue(output_queue, producer, lines):
+    start = time.perf_counter()
+    process = Process(target=producer, args=(output_queue, lines))
+    process.start()
+    received = consume_queue(output_queue)
+    process.join()
+    assert received == lines
+    return time.perf_counter() - start
+
+
+def through_pipe(lines, batch):
+    reader, writer = Pipe(duplex=False)
+    start = time.perf_counter()
+    process = Process(target=produce_pipe, args=(writer, lines, batch))
+    process.start()
+    received = 0
+    while True:
+        chunk = reader.recv()
+        if chunk is None:
+            break
+        received += len(chunk)
+    process.join()
+    assert received == lines
+    return time.perf_counter() - start
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    manager = Manager()
+    results = [
+        ("Manager queue, per line", through_queue(manager.Queue(), produce_per_line, lines)),
+        ("Manager queue, LogBatcher", through_queue(manager.Queue(), produce_batched, lines)),
+        ("multiprocessing.Queue, per line", through_queue(Queue(), produce_per_line, lines)),
+        ("multiprocessing.Queue, LogBatcher", through_queue(Queue(), produce_batched, lines)),
+        ("Pipe, per line", through_pipe(lines, 1)),
+        (f"Pipe, {BATCH} lines per send", through_pipe(lines, BATCH)),
+    ]
+    manager.shutdown()
+
+    print(f"{lines} log lines from one worker process")
+    for label, elapsed in results:
+        print(f"  {label:<36} {elapsed:7.3f}s  {lines / elapsed:>12,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Memory and time to expand one ``parallel: matrix:`` job into thousands of
+variants: each variant built from its own deep copy of the job config (a
+naive expansion) versus variants sharing the config, as _parse_jobs does.
+
+    python benchmarks/bench_matrix_memory.py [variants]
+"""
+
+import copy
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scarycicd import Job, expand_parallel  # noqa: E402
+
+GLOBAL_VARIABLES = {f"GLOBAL_{i}": f"value-{i}" for i in range(20)}
+
+
+def job_config(variants):
+    """A matrix job of about ``variants`` variants with a realistic body."""
+    shards = max(1, variants // 50)
+    return {
+        'stage': 'test',
+        'image': 'python:$PY',
+        'parallel': {'matrix': [{
+            'PY': [f"3.{minor}" for minor in range(50)],
+            'SHARD': [str(i) for i in range(shards)],
+        }]},
+        'script': [f"step {i} --flag-{i} --shard $SHARD" for i in range(10)]
+                  + [f"echo static line {i}" for i in range(20)],
+        'needs': [f"build-{i}" for i in range(10)],
+        'artifacts': {'paths': [f"reports/{i}" for i in range(5)]},
+        'inputs': ['src', 'tests', 'pyproject.toml'],
+    }
+
+
+def copied(config):
+    return [
+        Job(name, copy.deepcopy(config), dict(GLOBAL_VARIABLES), matrix_variables)
+        for name, matrix_variables in expand_parallel('test', config['parallel'])
+    ]
+
+
+def shared(config):
+    return [
+        Job(name, config, GLOBAL_VARIABLES, matrix_variables)
+        for name, matrix_variables in expand_parallel('test', config['parallel'])
+    ]
+
+
+def measure(build, config):
+    """Return (jobs, bytes held by them, seconds); time is taken untraced."""
+    start = time.perf_counter()
+    build(config)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    jobs = build(config)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(jobs), size, elapsed
+
+
+def main():
+    variants = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    config = job_config(variants)
+
+    print(f"one matrix job, 30 script lines, 10 needs")
+    for label, build in (("deep copy per variant", copied), ("shared config", shared)):
+        count, size, elapsed = measure(build, config)
+        print(f"  {label:<22} {count} jobs  {size / 1024 ** 2:6.1f} MiB  "
+              f"({size / count:,.0f} B/job)  {elapsed * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Startup cost of scarycicd: the import time reported by ``python -X
+importtime`` and the wall time of ``scarycicd.py --help``, optionally next
+to the same numbers for scarycicd.py at another git revision.
+
+    python benchmarks/bench_startup.py [runs] [git-revision]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Measure imports from bytecode, as an installed copy would run
+ENV = {name: value for name, value in os.environ.items() if name != 'PYTHONDONTWRITEBYTECODE'}
+
+
+def import_times(directory):
+    """Return ({module: cumulative microseconds}, total) for one import.
+
+    Module names keep importtime's indentation, which shows nesting depth.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import scarycicd'],
+        cwd=directory, capture_output=True, text=True, check=True, env=ENV
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        modules[name.rstrip()[1:]] = int(cumulative)
+    return modules, modules['scarycicd']
+
+
+def help_time(directory):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, 'scarycicd.py', '--help'],
+        cwd=directory, capture_output=True, check=False, env=ENV
+    )
+    return time.perf_counter() - start
+
+
+def measure(directory, runs):
+    import_times(directory)  # Writes the bytecode cache
+    totals = []
+    for _ in range(runs):
+        modules, total = import_times(directory)
+        totals.append(total)
+    walls = [help_time(directory) for _ in range(runs)]
+    # Modules imported directly by scarycicd
+    heaviest = sorted(
+        ((us, name.strip()) for name, us in modules.items()
+         if name.startswith('  ') and not name.startswith('   ')),
+        reverse=True
+    )[:5]
+    return statistics.median(totals), statistics.median(walls), heaviest
+
+
+def report(label, directory, runs):
+    imported, wall, heaviest = measure(directory, runs)
+    print(f"{label}")
+    print(f"  import scarycicd:  {imported / 1000:6.1f} ms (median of {runs})")
+    print(f"  scarycicd --help:  {wall * 1000:6.1f} ms wall")
+    print(f"  heaviest imports:  {', '.join(f'{name} {us / 1000:.1f} ms' for us, name in heaviest)}")
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    revision = sys.argv[2] if len(sys.argv) > 2 else None
+
+    if revision:
+        source = subprocess.run(
+            ['git', 'show', f'{revision}:scarycicd.py'],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        with tempfile.TemporaryDirectory() as directory:
+            (Path(directory) / 'scarycicd.py').write_text(source)
+            report(f"scarycicd.py at {revision}", directory, runs)
+
+    report("scarycicd.py in the working tree", ROOT, runs)
+
+
+if __name__ == "__main__":
+    main()
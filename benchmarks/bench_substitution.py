@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Variable substitution over a large script: one str.replace per variable per
+line (the old substitute_variables) versus the single-pass Substitution,
+with an empty and with a warm template cache.
+
+    python benchmarks/bench_substitution.py [variables] [lines]
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scarycicd import Substitution, compile_template  # noqa: E402
+
+
+def replace_per_variable(text, variables):
+    for key, value in variables.items():
+        text = text.replace(f'${key}', str(value))
+    return text
+
+
+def make_inputs(variable_count, line_count):
+    rng = random.Random(0)
+    variables = {f"VAR_{i}": f"value-{i}" for i in range(variable_count)}
+    names = list(variables)
+    lines = []
+    for i in range(line_count):
+        a, b, c = rng.sample(names, 3)
+        lines.append(f"run step-{i} --in ${a} --out ${{{b}}}/build --tag $HOME-{c}")
+    return variables, lines
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    variable_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    lines_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    variables, lines = make_inputs(variable_count, lines_count)
+
+    _, before = timed(lambda: [replace_per_variable(line, variables) for line in lines])
+
+    compile_template.cache_clear()
+    substitution = Substitution(variables)
+    _, cold = timed(lambda: [substitution.apply(line) for line in lines])
+    substitution = Substitution(variables)
+    _, warm = timed(lambda: [substitution.apply(line) for line in lines])
+
+    print(f"{variable_count} variables x {lines_count} script lines")
+    print(f"  str.replace per variable:       {before * 1000:8.1f} ms")
+    print(f"  single pass, cold templates:    {cold * 1000:8.1f} ms")
+    print(f"  single pass, cached templates:  {warm * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
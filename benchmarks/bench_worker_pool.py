@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Per-batch scheduling overhead: a fresh Manager + Pool per batch (the old
+_execute_job_batch) versus one WorkerPool reused for the whole run.
+
+Jobs are no-ops so only the executor overhead is measured: the persistent
+pool goes through WorkerPool.submit and next_event as a pipeline run does,
+with run_job_parallel swapped for a job that only logs one line.
+
+    python benchmarks/bench_worker_pool.py [batches] [jobs_per_batch]
+"""
+
+import sys
+import time
+from multiprocessing import Pool, Manager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import scarycicd  # noqa: E402
+from scarycicd import _JOB_DONE, Job, WorkerPool  # noqa: E402
+
+
+def noop_job(name, output_queue):
+    output_queue.put(f"[{name}] done")
+    return (name, True, None)
+
+
+def noop_job_parallel(job, workspace, artifact_manager, output_queue, *args):
+    return noop_job(job.name, output_queue)
+
+
+def fresh_pool_per_batch(batches, jobs_per_batch):
+    start = time.perf_counter()
+    for batch in range(batches):
+        manager = Manager()
+        output_queue = manager.Queue()
+        with Pool(processes=jobs_per_batch) as pool:
+            names = [f"job-{batch}-{i}" for i in range(jobs_per_batch)]
+            pool.starmap(noop_job, [(name, output_queue) for name in names])
+        manager.shutdown()
+    return time.perf_counter() - start
+
+
+def persistent_pool(batches, jobs_per_batch):
+    # Worker processes are forked, so they inherit the no-op job
+    scarycicd.run_job_parallel = noop_job_parallel
+    start = time.perf_counter()
+    worker_pool = WorkerPool('.', None, jobs_per_batch)
+    try:
+        for batch in range(batches):
+            for i in range(jobs_per_batch):
+                worker_pool.submit(Job(f"job-{batch}-{i}", {'script': ['true']}, {}))
+            done = 0
+            while done < jobs_per_batch:
+                message = worker_pool.next_event()
+                if isinstance(message, tuple) and message[0] == _JOB_DONE:
+                    done += 1
+    finally:
+        worker_pool.close()
+    return time.perf_counter() - start
+
+
+def main():
+    batches = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    jobs_per_batch = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    before = fresh_pool_per_batch(batches, jobs_per_batch)
+    after = persistent_pool(batches, jobs_per_batch)
+
+    print(f"{batches} batches x {jobs_per_batch} jobs")
+    print(f"  fresh Manager + Pool per batch: {before:.3f}s ({before / batches * 1000:.1f} ms/batch)")
+    print(f"  persistent WorkerPool:          {after:.3f}s ({after / batches * 1000:.1f} ms/batch)")
+
+
+if __name__ == "__main__":
+    main()
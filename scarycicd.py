@@ -7,21 +7,124 @@ ScaryCICD v0x00: Scary-ready
 Booo: It's modified now.
 """
 
-import yaml
+import functools
+import importlib.util
 import subprocess
 import sys
-import shutil
 import os
 import re
+import hashlib
+import heapq
+import itertools
+import json
+import marshal
+import queue
+import signal
+import stat
+import threading
+import types
+import uuid
 from pathlib import Path
-from collections import defaultdict, deque
-from multiprocessing import Pool, Manager
-from functools import partial
+from collections import ChainMap, defaultdict, deque
+from contextlib import contextmanager
 import time
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+_lazy_lock = threading.RLock()
+_lazy_loading = set()
+
+
+class _LazyModule(types.ModuleType):
+    """A module that is executed the first time a missing attribute is read.
+
+    Unlike importlib.util.LazyLoader before Python 3.12.3, the first use is
+    safe from several threads: the others wait until the module has run.
+    """
+
+    def __getattr__(self, attr):
+        name = self.__spec__.name
+        with _lazy_lock:
+            if type(self) is _LazyModule:
+                if name in _lazy_loading:
+                    # Read by the module's own code while it runs
+                    raise AttributeError(f"module '{name}' has no attribute '{attr}'")
+                _lazy_loading.add(name)
+                try:
+                    self.__spec__.loader.exec_module(self)
+                finally:
+                    _lazy_loading.discard(name)
+                self.__class__ = types.ModuleType
+        return getattr(self, attr)
+
+
+def lazy_import(name):
+    """Return module ``name``, executed only when an attribute is first used.
+
+    Keeps modules that only some code paths need out of the startup time.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'", name=name)
+    module = importlib.util.module_from_spec(spec)
+    module.__class__ = _LazyModule
+    sys.modules[name] = module
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+asyncio = lazy_import('asyncio')
+futures = lazy_import('concurrent.futures')
+multiprocessing = lazy_import('multiprocessing')
+shutil = lazy_import('shutil')
+sqlite3 = lazy_import('sqlite3')
+yaml = lazy_import('yaml')
+
+
+def find_git_dir(start):
+    """Return the git directory of the repository containing ``start``, or None.
+
+    Follows the ``gitdir:`` file that worktrees and submodules have in
+    place of a ``.git`` directory.
+    """
+    for directory in (start, *start.parents):
+        dot_git = directory / '.git'
+        if dot_git.is_dir():
+            return dot_git
+        if dot_git.is_file():
+            content = dot_git.read_text().strip()
+            if content.startswith('gitdir:'):
+                return (directory / content[len('gitdir:'):].strip()).resolve()
+            return None
+    return None
+
 
 def get_current_branch():
-    """Get the current git branch."""
+    """Get the current git branch.
+
+    Reads ``HEAD`` from the git directory, and asks git itself only when
+    there is none to read (or ``GIT_DIR`` points elsewhere).
+    """
+    if 'GIT_DIR' not in os.environ:
+        try:
+            git_dir = find_git_dir(Path.cwd())
+            if git_dir is not None:
+                head = (git_dir / 'HEAD').read_text().strip()
+                if head.startswith('ref: refs/heads/'):
+                    return head[len('ref: refs/heads/'):]
+                if not head.startswith('ref:'):
+                    return 'HEAD'  # Detached, as git rev-parse --abbrev-ref reports it
+        except OSError:
+            pass
+
     try:
         result = subprocess.run(
             ['git', 'rev-parse', '--abbrev-ref', 'HEAD'],
@@ -34,21 +137,308 @@ def get_current_branch():
         return 'main'
 
 
+# $VAR or ${VAR}; the name is matched greedily, so $FOO never matches in $FOOBAR
+VARIABLE_PATTERN = re.compile(r'\$(?:\{([A-Za-z_][A-Za-z0-9_]*)\}|([A-Za-z_][A-Za-z0-9_]*))')
+
+
+@functools.lru_cache(maxsize=16384)
+def compile_template(text):
+    """Split text into its literal parts and the variable references between them.
+
+    Returns ``(literals, references)`` with one more literal than references;
+    each reference is ``(name, as_written)``.
+    """
+    parts = VARIABLE_PATTERN.split(text)
+    literals = tuple(parts[0::3])
+    references = tuple(
+        (braced, f'${{{braced}}}') if braced else (bare, f'${bare}')
+        for braced, bare in zip(parts[1::3], parts[2::3])
+    )
+    return literals, references
+
+
+class Substitution:
+    """Substitutes one set of variables into strings in a single pass.
+
+    ``$VAR`` and ``${VAR}`` are both replaced, and variable values may
+    reference other variables. Each value is resolved and each distinct
+    string rendered once, so jobs sharing variables can share one instance.
+    Unknown variables and cyclic references are left as written for the shell.
+    """
+
+    def __init__(self, variables):
+        self.variables = variables
+        self.resolved = {}
+        self.resolving = set()
+        self.rendered = {}
+
+    def apply(self, text):
+        if not isinstance(text, str) or '$' not in text:
+            return text
+
+        result = self.rendered.get(text)
+        if result is not None:
+            return result
+
+        literals, references = compile_template(text)
+        parts = [literals[0]]
+        for (name, as_written), literal in zip(references, literals[1:]):
+            parts.append(self._value(name, as_written))
+            parts.append(literal)
+        result = self.rendered[text] = ''.join(parts)
+        return result
+
+    def _value(self, name, as_written):
+        value = self.resolved.get(name)
+        if value is not None:
+            return value
+        if name not in self.variables or name in self.resolving:
+            return as_written
+
+        self.resolving.add(name)
+        value = self.apply(str(self.variables[name]))
+        self.resolving.discard(name)
+        self.resolved[name] = value
+        return value
+
+
 def substitute_variables(text, variables):
-    """Substitute ${VAR} style variables in text."""
-    if not isinstance(text, str):
-        return text
+    """Substitute $VAR and ${VAR} style variables in text."""
+    return Substitution(variables).apply(text)
+
+
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_size(value):
+    """Parse a byte size such as 512, '64M' or '4G'."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*', str(value), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size '{value}'")
+    number, unit = match.groups()
+    return int(float(number) * SIZE_UNITS[unit.upper()])
+
+
+def safe_name(job_name):
+    """Return a job name usable in file and container names.
+
+    Names such as ``build 1/2`` or ``build: [3.11]`` are not usable as
+    paths, in a docker ``-v`` spec or as a container name, so they are
+    sanitized and given a hash of the real name to stay unique.
+    """
+    name = re.sub(r'[^a-zA-Z0-9_.-]', '-', job_name)
+    if name == job_name:
+        return job_name
+    return f"{name}-{hashlib.sha256(job_name.encode()).hexdigest()[:8]}"
+
+
+# What scarycicd itself keeps in the workspace; never part of a job's inputs
+STATE_DIRS = {'.scarycicd', '.pipeline_artifacts'}
+LOG_DIR = 'logs'
+
+
+def input_files(root, path):
+    """Return the files under the directory ``path``, skipping scarycicd's own state."""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(path):
+        rel_dir = os.path.relpath(dirpath, root)
+        if rel_dir == '.':
+            dirnames[:] = [name for name in dirnames if name not in STATE_DIRS]
+        for name in filenames:
+            if rel_dir == LOG_DIR and name.endswith('.log'):
+                continue
+            item = Path(dirpath) / name
+            if item.is_file():
+                files.append(item)
+    return sorted(files)
+
+
+def hash_paths(digest, root, paths):
+    """Feed the names and contents of the files under root/paths into digest.
+
+    Job logs and the artifact, cache and history directories are skipped,
+    so ``inputs: ["."]`` does not change with every run.
+    """
+    root = Path(root)
+    for rel_path in sorted(str(path) for path in paths):
+        path = root / rel_path
+        if path.is_dir():
+            files = input_files(root, path)
+        elif path.is_file():
+            files = [path]
+        else:
+            digest.update(f"missing:{rel_path}\0".encode())
+            continue
+
+        for item in files:
+            digest.update(f"file:{item.relative_to(root)}\0".encode())
+            with open(item, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+
+
+def walk_files(root):
+    """Return (path, stat) for every regular file under root, using os.scandir."""
+    files = []
+    pending = [str(root)]
+    while pending:
+        directory = pending.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    pending.append(entry.path)
+                elif entry.is_file():
+                    files.append((entry.path, entry.stat()))
+    files.sort()
+    return files
+
+
+class Tracer:
+    """Collects timing spans of a run and writes them as Chrome Trace Event JSON.
+
+    A span is a dict with name, start and end (epoch seconds) plus optional
+    job, stage and worker tags. Spans with ``instant`` set mark a point in
+    time. Every job gets its own track; pipeline-level spans share one.
+    """
+
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def span(self, name, **tags):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.spans.append({'name': name, 'start': start, 'end': time.time(), **tags})
+
+    def extend(self, spans):
+        self.spans.extend(spans)
+
+    def write(self, path):
+        """Write the spans as a Chrome trace, viewable in Perfetto."""
+        tracks = {}
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'scarycicd'}}]
+        for span in sorted(self.spans, key=lambda span: span['start']):
+            track = span.get('job') or 'pipeline'
+            if track not in tracks:
+                tracks[track] = len(tracks) + 1
+                events.append({
+                    'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tracks[track],
+                    'args': {'name': track},
+                })
+
+            event = {
+                'name': span['name'],
+                'cat': span.get('stage') or 'pipeline',
+                'ts': int(span['start'] * 1e6),
+                'pid': 1,
+                'tid': tracks[track],
+                'args': {key: span[key] for key in ('job', 'stage', 'worker') if span.get(key)},
+            }
+            if span.get('instant'):
+                event.update(ph='i', s='t')
+            else:
+                event.update(ph='X', dur=int((span['end'] - span['start']) * 1e6))
+            events.append(event)
+
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def critical_path(order, dependencies, durations):
+    """Compute the critical path and each job's slack.
+
+    ``order`` lists job names in topological order, ``dependencies`` maps
+    each name to the names it waits for and ``durations`` gives measured
+    seconds per job. Jobs without a duration are left out.
+    """
+    order = [name for name in order if name in durations]
+    earliest_start = {}
+    earliest_finish = {}
+    for name in order:
+        deps = [dep for dep in dependencies.get(name, []) if dep in durations]
+        earliest_start[name] = max((earliest_finish[dep] for dep in deps), default=0.0)
+        earliest_finish[name] = earliest_start[name] + durations[name]
+
+    length = max(earliest_finish.values(), default=0.0)
+    dependents = defaultdict(list)
+    for name in order:
+        for dep in dependencies.get(name, []):
+            if dep in durations:
+                dependents[dep].append(name)
+
+    latest_start = {}
+    for name in reversed(order):
+        latest_finish = min((latest_start[child] for child in dependents[name]), default=length)
+        latest_start[name] = latest_finish - durations[name]
+
+    path = []
+    current = max(order, key=lambda name: earliest_finish[name], default=None)
+    while current is not None:
+        path.append(current)
+        deps = [dep for dep in dependencies.get(current, []) if dep in durations]
+        current = max(deps, key=lambda dep: earliest_finish[dep], default=None)
+    path.reverse()
+
+    return {
+        'length': length,
+        'path': path,
+        'jobs': {
+            name: {
+                'duration': durations[name],
+                'earliest_start': earliest_start[name],
+                'latest_start': latest_start[name],
+                'slack': latest_start[name] - earliest_start[name],
+            }
+            for name in order
+        },
+    }
+
+
+def expand_parallel(name, parallel):
+    """Return ``(job_name, variables)`` for every variant of a parallel job.
+
+    ``parallel`` is either a count, giving ``CI_NODE_INDEX``/``CI_NODE_TOTAL``
+    to each copy, or ``{'matrix': [...]}``, where every entry maps variables
+    to a value or a list of values and adds the product of its lists.
+    """
+    if isinstance(parallel, int):
+        return [
+            (f"{name} {index}/{parallel}",
+             {'CI_NODE_INDEX': str(index), 'CI_NODE_TOTAL': str(parallel)})
+            for index in range(1, parallel + 1)
+        ]
 
-    for key, value in variables.items():
-        text = text.replace(f'${key}', str(value))
+    if not isinstance(parallel, dict) or not isinstance(parallel.get('matrix'), list):
+        raise ValueError(f"Job '{name}': 'parallel' must be a number or have a 'matrix' list")
 
-    return text
+    variants = []
+    for entry in parallel['matrix']:
+        keys = list(entry)
+        values = [value if isinstance(value, list) else [value] for value in entry.values()]
+        for combo in itertools.product(*values):
+            combo = [str(value) for value in combo]
+            variants.append((f"{name}: [{', '.join(combo)}]", dict(zip(keys, combo))))
+    return variants
 
 
 class Job:
-    """Represents a single pipeline job."""
+    """Represents a single pipeline job.
+
+    Variants of a parallel job are built from the same config and share its
+    lists; only the name, variables and image are their own, plus any of
+    script, artifact paths, needs or inputs that substitution changes. Jobs
+    without matrix variables can share one ``substitution``.
+    """
+
+    __slots__ = (
+        'name', 'image', 'script', 'stage', 'artifacts', 'needs', 'only', 'timeout',
+        'inputs', 'resource_group', 'allow_failure', 'cpus', 'memory', 'variables',
+    )
 
-    def __init__(self, name, config, global_variables=None):
+    def __init__(self, name, config, global_variables=None, matrix_variables=None,
+                 substitution=None):
         self.name = name
         self.image = config.get('image', 'python:3.12')
         self.script = config.get('script', [])
@@ -57,11 +447,26 @@ class Job:
         self.needs = config.get('needs', [])
         self.only = config.get('only', [])  # Branch filter
         self.timeout = config.get('timeout', 3600)  # Default 1 hour
-
-        # Substitute variables in image and script
+        self.inputs = config.get('inputs', [])  # Paths hashed into the cache key
+        self.resource_group = config.get('resource_group')  # One job per group at a time
+        self.allow_failure = bool(config.get('allow_failure', False))
+        resources = config.get('resources', {})
+        self.cpus = float(resources['cpu']) if 'cpu' in resources else None
+        self.memory = parse_size(resources['mem']) if 'mem' in resources else None
+
+        # Substitute variables in image, script and paths
         variables = global_variables or {}
-        self.image = substitute_variables(self.image, variables)
-        self.script = [substitute_variables(cmd, variables) for cmd in self.script]
+        if matrix_variables:
+            variables = ChainMap(matrix_variables, variables)
+        self.variables = variables
+        if matrix_variables or substitution is None:
+            substitution = Substitution(variables)
+        self.image = substitution.apply(self.image)
+        for attr in ('script', 'artifacts', 'needs', 'inputs'):
+            values = getattr(self, attr)
+            substituted = [substitution.apply(value) for value in values]
+            if substituted != values:
+                setattr(self, attr, substituted)
 
     def should_run(self, branch):
         """Check if job should run on current branch."""
@@ -73,57 +478,326 @@ class Job:
         return f"Job({self.name}, stage={self.stage})"
 
 
+# ioctl request number for FICLONE from <linux/fs.h>
+FICLONE = 0x40049409
+
+
+def reflink_file(src, dst):
+    """Clone src into dst sharing its data blocks (btrfs, XFS, ...).
+
+    Raises OSError where the filesystem does not support it.
+    """
+    if fcntl is None:
+        raise OSError("reflink is not supported on this platform")
+
+    with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            dst_file.close()
+            os.unlink(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def place_file(src, dst, link=False):
+    """Place src at dst and return the strategy used.
+
+    With ``link`` a reflink is tried first, then a hard link, before
+    falling back to a plain copy.
+    """
+    if link:
+        if os.path.lexists(dst):
+            os.unlink(dst)
+        try:
+            reflink_file(src, dst)
+            return 'reflink'
+        except OSError:
+            pass
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except OSError:
+            pass
+
+    shutil.copy2(src, dst)
+    return 'copy'
+
+
+def format_size(size):
+    """Format a byte count for humans."""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
 class ArtifactManager:
-    """Manages artifact storage and retrieval."""
+    """Manages artifact storage and retrieval.
 
-    def __init__(self, workspace):
+    File contents are stored once in a blob store keyed by SHA-256
+    (``blobs/ab/abcd...``). Each job gets a manifest (``manifests/<job>.json``)
+    mapping its artifact paths to digest, mode and size.
+
+    Manifests and views left by a run killed before ``cleanup`` are removed
+    on start, so they are never mistaken for this run's artifacts. Blobs
+    are named by their content and are kept.
+    """
+
+    # Fewest files worth handing to io_workers threads
+    PARALLEL_MIN_FILES = 64
+
+    def __init__(self, workspace, link=False, io_workers=None):
         self.workspace = Path(workspace).resolve()
         self.artifact_dir = self.workspace / '.pipeline_artifacts'
-        self.artifact_dir.mkdir(exist_ok=True)
+        self.blob_dir = self.artifact_dir / 'blobs'
+        self.manifest_dir = self.artifact_dir / 'manifests'
+        self.view_dir = self.artifact_dir / 'views'
+        for directory in (self.manifest_dir, self.view_dir):
+            if directory.exists():
+                shutil.rmtree(directory)
+            directory.mkdir(parents=True)
+        # Create every blob fan-out directory up front instead of once per file
+        for prefix in range(256):
+            (self.blob_dir / f"{prefix:02x}").mkdir(parents=True, exist_ok=True)
+        self.link = link
+        # Threads only paid off where measured, so serial unless asked for
+        self.io_workers = io_workers or 1
+        self.last_save_stats = {}
+
+    def _map(self, func, items):
+        """Apply func to items on a thread pool so file I/O overlaps.
+
+        Items are handed out in chunks to keep per-task overhead low for
+        trees of many small files. With a single core, or fewer than
+        ``PARALLEL_MIN_FILES`` items, threads only add overhead and the
+        items are handled serially.
+        """
+        if (self.io_workers <= 1 or len(items) < self.PARALLEL_MIN_FILES
+                or (os.cpu_count() or 1) < 2):
+            return [func(item) for item in items]
+
+        chunk_size = max(1, min(256, len(items) // (self.io_workers * 4)))
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        with futures.ThreadPoolExecutor(max_workers=self.io_workers) as pool:
+            return [
+                result
+                for chunk_results in pool.map(lambda chunk: [func(item) for item in chunk], chunks)
+                for result in chunk_results
+            ]
+
+    def _blob_path(self, digest):
+        return self.blob_dir / digest[:2] / digest
+
+    def _temp_path(self, directory, name):
+        """Return a unique scratch path next to its final location."""
+        return directory / f".{name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+
+    def _store_blob(self, src):
+        """Add a file to the blob store; return (digest, strategy)."""
+        if self.link:
+            digest = hashlib.sha256()
+            with open(src, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            digest = digest.hexdigest()
+            blob = self._blob_path(digest)
+            if blob.exists():
+                return digest, 'dedup'
+            tmp = self._temp_path(blob.parent, digest)
+            strategy = place_file(src, tmp, link=True)
+        else:
+            # Hash while copying so each file is read once
+            digest = hashlib.sha256()
+            tmp = self._temp_path(self.blob_dir, 'blob')
+            with open(src, 'rb') as src_file, open(tmp, 'wb') as dst_file:
+                for chunk in iter(lambda: src_file.read(1024 * 1024), b''):
+                    digest.update(chunk)
+                    dst_file.write(chunk)
+            shutil.copystat(src, tmp)
+            digest = digest.hexdigest()
+            blob = self._blob_path(digest)
+            if blob.exists():
+                os.unlink(tmp)
+                return digest, 'dedup'
+            strategy = 'copy'
+
+        os.replace(tmp, blob)
+        return digest, strategy
 
     def save_artifacts(self, job_name, artifact_paths):
-        """Save artifacts from a job."""
+        """Save artifacts from a job.
+
+        How each file was stored is recorded in ``last_save_stats``.
+        """
         if not artifact_paths:
             return
 
-        job_artifact_dir = self.artifact_dir / job_name
-        job_artifact_dir.mkdir(exist_ok=True)
-
         saved_count = 0
+        sources = []
+        saved_paths = []
         for artifact_path in artifact_paths:
             src = self.workspace / artifact_path
-            if src.exists():
-                dst = job_artifact_dir / artifact_path
-                dst.parent.mkdir(parents=True, exist_ok=True)
-
-                if src.is_dir():
-                    shutil.copytree(src, dst, dirs_exist_ok=True)
-                else:
-                    shutil.copy2(src, dst)
-
-                saved_count += 1
+            if not src.exists():
+                continue
+            saved_paths.append(Path(os.path.normpath(artifact_path)).as_posix())
 
+            if src.is_dir():
+                sources.extend(walk_files(src))
+            else:
+                sources.append((str(src), src.stat()))
+            saved_count += 1
+
+        stats = {'reflink': 0, 'hardlink': 0, 'copy': 0, 'dedup': 0, 'bytes_avoided': 0}
+        files = {}
+        results = self._map(lambda source: self._store_blob(source[0]), sources)
+        for (path, info), (digest, strategy) in zip(sources, results):
+            stats[strategy] += 1
+            if strategy != 'copy':
+                stats['bytes_avoided'] += info.st_size
+            rel_path = Path(os.path.relpath(path, self.workspace)).as_posix()
+            files[rel_path] = {
+                'digest': digest,
+                'mode': stat.S_IMODE(info.st_mode),
+                'size': info.st_size,
+            }
+
+        file_name = safe_name(job_name)
+        manifest_file = self.manifest_dir / f"{file_name}.json"
+        tmp = self._temp_path(self.manifest_dir, file_name)
+        with open(tmp, 'w') as f:
+            json.dump({'job': job_name, 'paths': saved_paths, 'files': files}, f, sort_keys=True)
+        os.replace(tmp, manifest_file)
+
+        self.last_save_stats = stats
         return saved_count
 
-    def load_artifacts(self, job_names):
-        """Load artifacts from dependent jobs."""
-        loaded_count = 0
+    def _read_manifest(self, job_name):
+        """Return a job's manifest: its saved artifact ``paths`` and ``files``."""
+        try:
+            with open(self.manifest_dir / f"{safe_name(job_name)}.json") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'paths': [], 'files': {}}
+
+    def manifest(self, job_name):
+        """Return a job's artifact files as {path: {digest, mode, size}}."""
+        return self._read_manifest(job_name)['files']
+
+    def load_artifacts(self, job_names, mount=False):
+        """Load artifacts from dependent jobs.
+
+        With ``mount``, each artifact path as declared by a job is returned
+        as a read-only bind mount of that path in the job's materialized
+        view, so the rest of an enclosing directory stays as it is in the
+        workspace. A path is placed in the workspace instead when several
+        jobs provide it or it overlaps another provided path. Placed files
+        are reflinked or copied, so jobs cannot modify stored blobs.
+
+        Returns ``(file_count, binds)`` where binds is a list of
+        ``(host_path, workspace_relative_path)`` pairs.
+        """
+        providers = defaultdict(list)
+        manifests = {}
         for job_name in job_names:
-            job_artifact_dir = self.artifact_dir / job_name
-            if not job_artifact_dir.exists():
+            manifests[job_name] = self._read_manifest(job_name)
+            for path in manifests[job_name]['paths']:
+                if job_name not in providers[path]:
+                    providers[path].append(job_name)
+
+        def under(rel_path, path):
+            return path == '.' or rel_path == path or rel_path.startswith(path + '/')
+
+        def overlaps(path):
+            return any(
+                other != path and (under(other, path) or under(path, other))
+                for other in providers
+            )
+
+        loaded_count = 0
+        binds = []
+        for path, provider_jobs in providers.items():
+            if mount and len(provider_jobs) == 1 and path != '.' and not overlaps(path):
+                job_name = provider_jobs[0]
+                files = manifests[job_name]['files']
+                count = sum(1 for rel_path in files if under(rel_path, path))
+                if count:
+                    binds.append((self._view(job_name, files) / path, path))
+                    loaded_count += count
                 continue
 
-            for item in job_artifact_dir.rglob('*'):
-                if item.is_file():
-                    # shutil : Permission denied.
-                    # rel_path = item.relative_to(job_artifact_dir)
-                    # dst = self.workspace / rel_path
-                    # print(f"{dst} {job_artifact_dir.exists()} {job_artifact_dir}, dst shutil :/")
-                    # dst.parent.mkdir(parents=True, exist_ok=True)
-                    # shutil.copy2(item, dst)
-                    loaded_count += 1
+            for job_name in provider_jobs:
+                for rel_path, entry in manifests[job_name]['files'].items():
+                    if under(rel_path, path):
+                        loaded_count += self._place_in_workspace(entry, self.workspace / rel_path)
+
+        return loaded_count, binds
+
+    def _materialize(self, entry, dst, shared=False):
+        """Create dst from a blob; return the strategy used.
+
+        ``shared`` files (in read-only views) are hard linked to the blob
+        when it has the right mode. Anything a job can write gets a reflink
+        with ``link`` or a copy, so in-place edits never reach the blob.
+        """
+        blob = self._blob_path(entry['digest'])
+        if shared and stat.S_IMODE(blob.stat().st_mode) == entry['mode']:
+            return place_file(blob, dst, link=True)
+
+        strategy = 'copy'
+        if self.link:
+            try:
+                reflink_file(blob, dst)
+                strategy = 'reflink'
+            except OSError:
+                shutil.copy2(blob, dst)
+        else:
+            shutil.copy2(blob, dst)
+        os.chmod(dst, entry['mode'])
+        return strategy
+
+    def _view(self, job_name, manifest):
+        """Return a directory laid out like the job's artifacts, built on first use."""
+        file_name = safe_name(job_name)
+        view = self.view_dir / file_name
+        if view.exists():
+            return view
+
+        tmp = self._temp_path(self.view_dir, file_name)
+        for directory in {(tmp / rel_path).parent for rel_path in manifest}:
+            directory.mkdir(parents=True, exist_ok=True)
+        self._map(
+            lambda item: self._materialize(item[1], tmp / item[0], shared=True),
+            list(manifest.items())
+        )
 
-        return loaded_count
+        try:
+            tmp.rename(view)
+        except OSError:
+            # Another job built the view first
+            shutil.rmtree(tmp, ignore_errors=True)
+        return view
+
+    def _place_in_workspace(self, entry, dst):
+        """Reflink or copy one artifact file to dst; return files placed."""
+        try:
+            blob = self._blob_path(entry['digest'])
+            if dst.exists() and os.path.samefile(blob, dst):
+                return 1
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            if os.path.lexists(dst):
+                os.unlink(dst)
+            self._materialize(entry, dst)
+        except OSError:
+            # Files written by root containers may not be replaceable
+            return 0
+        return 1
+
+    def digest(self, job_name):
+        """Return a SHA-256 digest of the artifacts saved by a job."""
+        manifest = self.manifest(job_name)
+        return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()
 
     def cleanup(self):
         """Remove all artifacts."""
@@ -131,124 +805,1338 @@ class ArtifactManager:
             shutil.rmtree(self.artifact_dir)
 
 
+class JobCache:
+    """Caches successful job runs keyed by a hash of everything they depend on.
+
+    Each entry stores a copy of the job's artifacts, so a later run with the
+    same key can restore them and skip the container. Entries are evicted
+    least recently used first once the cache grows past ``max_bytes``.
+    """
+
+    DEFAULT_MAX_BYTES = 1024 ** 3
+
+    def __init__(self, workspace, max_bytes=DEFAULT_MAX_BYTES):
+        self.workspace = Path(workspace).resolve()
+        self.cache_dir = self.workspace / '.scarycicd' / 'cache' / 'jobs'
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, job, artifact_manager):
+        """Hash the job definition, its input files and upstream artifacts."""
+        digest = hashlib.sha256()
+        definition = {
+            'image': job.image,
+            'script': job.script,
+            'variables': dict(job.variables),
+            'artifacts': job.artifacts,
+        }
+        digest.update(json.dumps(definition, sort_keys=True, default=str).encode())
+        hash_paths(digest, self.workspace, job.inputs)
+        for dep in sorted(job.needs):
+            digest.update(f"need:{dep}:{artifact_manager.digest(dep)}\0".encode())
+        return digest.hexdigest()
+
+    def restore(self, key, job):
+        """Copy a cached job's artifacts back into the workspace.
+
+        Returns False when there is no entry for the key.
+        """
+        entry = self.cache_dir / key
+        meta_file = entry / 'meta.json'
+        if not meta_file.exists():
+            return False
+
+        files_dir = entry / 'files'
+        for artifact_path in job.artifacts:
+            src = files_dir / artifact_path
+            dst = self.workspace / artifact_path
+            if src.is_dir():
+                shutil.copytree(src, dst, dirs_exist_ok=True)
+            elif src.exists():
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(src, dst)
+
+        # Mark the entry as recently used
+        os.utime(meta_file)
+        return True
+
+    def store(self, key, job):
+        """Record a successful run of a job and its artifacts.
+
+        Raises OSError if the entry cannot be written; nothing is left behind.
+        """
+        entry = self.cache_dir / key
+        if entry.exists():
+            return
+
+        staging = self.cache_dir / f".{key}.{os.getpid()}.tmp"
+        try:
+            files_dir = staging / 'files'
+            files_dir.mkdir(parents=True, exist_ok=True)
+            for artifact_path in job.artifacts:
+                src = self.workspace / artifact_path
+                dst = files_dir / artifact_path
+                if src.is_dir():
+                    shutil.copytree(src, dst, dirs_exist_ok=True)
+                elif src.exists():
+                    dst.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(src, dst)
+
+            size = sum(item.stat().st_size for item in files_dir.rglob('*') if item.is_file())
+            with open(staging / 'meta.json', 'w') as f:
+                json.dump({'job': job.name, 'size': size, 'created': time.time()}, f)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        try:
+            staging.rename(entry)
+        except OSError:
+            # Another worker stored the same key first
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits max_bytes."""
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            meta_file = entry / 'meta.json'
+            try:
+                with open(meta_file) as f:
+                    size = json.load(f)['size']
+                entries.append((meta_file.stat().st_mtime, size, entry))
+            except (OSError, ValueError, KeyError):
+                continue
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+def user_cache_dir():
+    """Return the per-user cache directory: $XDG_CACHE_HOME, else ~/.cache."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(base) / 'scarycicd'
+
+
+class ConfigCache:
+    """Caches parsed pipeline configs so unchanged files skip YAML parsing.
+
+    There is one entry per config path. It holds the file's mtime, size and
+    SHA-256 with the parsed config. Matching mtime and size is trusted as is;
+    otherwise the content hash decides, so a touched file is not reparsed.
+    Entries are marshal data, which unlike pickle cannot run code when
+    loaded; configs marshal cannot hold (such as YAML timestamps) are
+    simply not cached.
+    """
+
+    FORMAT = 2
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+
+    def _entry_path(self, config_file):
+        name = hashlib.sha256(str(config_file.resolve()).encode()).hexdigest()
+        return self.cache_dir / f'{name}.marshal'
+
+    def load(self, config_file):
+        """Return the parsed config, from the cache when the file is unchanged."""
+        config_file = Path(config_file)
+        entry_path = self._entry_path(config_file)
+        info = config_file.stat()
+        try:
+            with open(entry_path, 'rb') as f:
+                entry = marshal.load(f)
+            if entry['format'] != self.FORMAT:
+                entry = None
+        except (OSError, EOFError, ValueError, KeyError, TypeError):
+            entry = None
+
+        if entry and (entry['mtime'], entry['size']) == (info.st_mtime_ns, info.st_size):
+            return entry['config']
+
+        data = config_file.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        if entry and entry['sha256'] == digest:
+            config = entry['config']
+        else:
+            # The libyaml based loader is several times faster when available
+            loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+            config = yaml.load(data, Loader=loader)
+
+        self._store(entry_path, {
+            'format': self.FORMAT,
+            'mtime': info.st_mtime_ns,
+            'size': info.st_size,
+            'sha256': digest,
+            'config': config,
+        })
+        return config
+
+    def _store(self, entry_path, entry):
+        """Write an entry atomically; a read-only cache is not an error."""
+        try:
+            data = marshal.dumps(entry)
+        except ValueError:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            staging = entry_path.with_name(f'.{entry_path.name}.{os.getpid()}.tmp')
+            with open(staging, 'wb') as f:
+                f.write(data)
+            os.replace(staging, entry_path)
+        except OSError:
+            pass
+
+
+def resource_flags(cpus=None, memory=None):
+    """Return the docker run flags for a job's ``resources``."""
+    flags = []
+    if cpus is not None:
+        flags += ['--cpus', f'{cpus:g}']
+    if memory is not None:
+        flags += ['--memory', str(memory)]
+    return flags
+
+
+class ContainerPool:
+    """Pre-started containers per image that jobs run in with docker exec.
+
+    Containers are started with the job's cpu and memory limits, and only
+    reused by jobs with the same image and limits. A container is recycled
+    after ``max_uses`` jobs, or as soon as a job in it fails. Every
+    container carries the run's label, so ``remove_all`` also finds the
+    ones started from worker processes.
+    """
+
+    def __init__(self, workspace, max_uses=10, run_id=None):
+        self.workspace = Path(workspace).resolve()
+        self.max_uses = max_uses
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self._idle = defaultdict(list)
+        self._uses = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Idle containers belong to the process that started them
+        return {'workspace': self.workspace, 'max_uses': self.max_uses, 'run_id': self.run_id}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def acquire(self, image, cpus=None, memory=None):
+        """Return the name of a running container for the image and limits."""
+        key = (image, cpus, memory)
+        with self._lock:
+            if self._idle[key]:
+                return self._idle[key].pop()
+
+        name = f"scarycicd-warm-{self.run_id}-{uuid.uuid4().hex[:8]}"
+        result = subprocess.run(
+            [
+                'docker', 'run', '-d', '--rm',
+                '--name', name,
+                '--label', f'scarycicd.run={self.run_id}',
+                *resource_flags(cpus, memory),
+                '-v', f'{self.workspace}:/workspace',
+                '-w', '/workspace',
+                image,
+                'tail', '-f', '/dev/null'
+            ],
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Could not start container for {image}: {result.stderr.strip()}")
+        return name
+
+    def release(self, name, image, healthy=True, cpus=None, memory=None):
+        """Return a container to the pool, or remove it if it is used up."""
+        with self._lock:
+            uses = self._uses.get(name, 0) + 1
+            if healthy and uses < self.max_uses:
+                self._uses[name] = uses
+                self._idle[(image, cpus, memory)].append(name)
+                return
+            self._uses.pop(name, None)
+        self._remove([name])
+
+    def _remove(self, names):
+        try:
+            subprocess.run(['docker', 'rm', '-f', *names], capture_output=True, timeout=60)
+        except (OSError, subprocess.SubprocessError):
+            pass
+
+    def remove_all(self):
+        """Remove every container started for this run by any process."""
+        try:
+            result = subprocess.run(
+                ['docker', 'ps', '-aq', '--filter', f'label=scarycicd.run={self.run_id}'],
+                capture_output=True,
+                text=True,
+                timeout=60
+            )
+        except (OSError, subprocess.SubprocessError):
+            return
+        names = result.stdout.split()
+        if names:
+            self._remove(names)
+
+
+class LogBatcher:
+    """Log function that sends lines to the coordinator in batches.
+
+    A batch goes out as a ``(_JOB_LINES, lines)`` event once it holds
+    ``max_lines`` lines or its first line is ``max_delay`` seconds old, so
+    one queue round-trip carries many lines and a quiet job is not held back.
+    The age is watched by one flusher thread per batcher, started with the
+    first line and stopped by ``close``.
+    """
+
+    MAX_LINES = 256
+    MAX_DELAY = 0.05
+
+    def __init__(self, output_queue, max_lines=MAX_LINES, max_delay=MAX_DELAY):
+        self.output_queue = output_queue
+        self.max_lines = max_lines
+        self.max_delay = max_delay
+        self.lines = []
+        self.condition = threading.Condition()
+        self.deadline = None
+        self.flusher = None
+        self.closed = False
+
+    def __call__(self, msg):
+        with self.condition:
+            self.lines.append(msg)
+            if len(self.lines) >= self.max_lines:
+                self._send()
+            elif self.deadline is None:
+                self.deadline = time.monotonic() + self.max_delay
+                if self.flusher is None:
+                    self.flusher = threading.Thread(target=self._flush_when_due, daemon=True)
+                    self.flusher.start()
+                else:
+                    self.condition.notify()
+
+    def _flush_when_due(self):
+        with self.condition:
+            while not self.closed:
+                if self.deadline is None:
+                    self.condition.wait()
+                elif self.deadline > time.monotonic():
+                    self.condition.wait(self.deadline - time.monotonic())
+                else:
+                    self._send()
+
+    def flush(self):
+        """Send the pending lines now."""
+        with self.condition:
+            self._send()
+
+    def close(self):
+        """Send the pending lines and stop the flusher thread."""
+        with self.condition:
+            self._send()
+            self.closed = True
+            self.condition.notify()
+
+    def _send(self):
+        self.deadline = None
+        if self.lines:
+            self.output_queue.put((_JOB_LINES, self.lines))
+            self.lines = []
+
+
+class LineSplitter:
+    """Splits chunks of raw output into complete lines.
+
+    A line longer than ``max_line`` bytes is cut, so output without
+    newlines cannot grow the pending buffer without bound.
+    """
+
+    def __init__(self, max_line):
+        self.max_line = max_line
+        self.pending = b''
+
+    def feed(self, chunk):
+        """Return the lines completed by ``chunk``, without their newlines."""
+        lines = (self.pending + chunk).split(b'\n')
+        self.pending = lines.pop()
+        if len(self.pending) > self.max_line:
+            lines.append(self.pending)
+            self.pending = b''
+        return lines
+
+    def finish(self):
+        """Return the unterminated last line, if any."""
+        rest, self.pending = self.pending, b''
+        return [rest] if rest else []
+
+
+class JobLog:
+    """Writes a job's raw output to its log file and keeps the last lines.
+
+    Output is written as read from the container, through a large buffer;
+    only ``tail_lines`` lines are held in memory.
+    """
+
+    BUFFER_SIZE = 64 * 1024
+
+    def __init__(self, path, tail_lines=0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, 'wb', buffering=self.BUFFER_SIZE)
+        self.tail = deque(maxlen=tail_lines)
+        self.lines = 0
+
+    def write(self, chunk):
+        self.file.write(chunk)
+
+    def add_lines(self, lines):
+        self.lines += len(lines)
+        if self.tail.maxlen:
+            self.tail.extend(lines[-self.tail.maxlen:])
+
+    def close(self):
+        self.file.close()
+
+
 class JobExecutor:
     """Executes a job in a Docker container."""
 
-    def __init__(self, workspace, artifact_manager):
+    # Bytes read from the container's output at a time
+    READ_SIZE = 64 * 1024
+    # Longest output line forwarded as one line
+    LINE_LIMIT = 1024 * 1024
+
+    def __init__(self, workspace, artifact_manager, cache=None, containers=None,
+                 cancelled=None, log_tail=None):
         self.workspace = Path(workspace).resolve()
         self.artifact_manager = artifact_manager
+        self.cache = cache
+        self.containers = containers
+        self.cancelled = cancelled  # Names of jobs the coordinator cancelled
+        self.log_tail = log_tail  # Show only this many lines of failed jobs
+        self.worker = f"pid {os.getpid()}"
+        self.spans = []
+        self.output_queue = None
+        self.job_log = None
+
+    def _record(self, job, name, start, end=None):
+        """Record a timing span of the job; without end it is an instant."""
+        self.spans.append({
+            'name': name,
+            'start': start,
+            'end': end if end is not None else start,
+            'instant': end is None,
+            'job': job.name,
+            'stage': job.stage,
+            'worker': self.worker,
+        })
+
+    @contextmanager
+    def _span(self, job, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self._record(job, name, start, time.time())
+
+    def _container_started(self, job, launch_start, output=True):
+        """Record 'container start' up to the job's first output; return its end.
+
+        Starting a container takes until its script prints something, so
+        the span ends there rather than when docker was spawned.
+        """
+        now = time.time()
+        self._record(job, 'container start', launch_start, now)
+        if output:
+            self._record(job, 'first output byte', now)
+        return now
+
+    def _stream(self, job, process, log, launch_start):
+        """Forward container output until the process exits."""
+        fd = process.stdout.fileno()
+        splitter = LineSplitter(self.LINE_LIMIT)
+        running_since = None
+        try:
+            while chunk := os.read(fd, self.READ_SIZE):
+                if running_since is None:
+                    running_since = self._container_started(job, launch_start)
+                self.job_log.write(chunk)
+                self._output(job, splitter.feed(chunk), log)
+            self._output(job, splitter.finish(), log)
+            if running_since is None:
+                running_since = self._container_started(job, launch_start, output=False)
+            return process.wait()
+        finally:
+            if running_since is not None:
+                self._record(job, 'script run', running_since, time.time())
+
+    def _emit_spans(self, output_queue):
+        """Send the recorded spans to the coordinator."""
+        if output_queue:
+            output_queue.put((_JOB_SPANS, self.spans))
+
+    def _announce(self, job, container_name):
+        """Tell the coordinator which container runs the job, so it can kill it."""
+        if self.output_queue:
+            self.output_queue.put((_JOB_CONTAINER, (job.name, container_name)))
+
+    def _is_cancelled(self, job, log):
+        if self.cancelled is not None and job.name in self.cancelled:
+            log(f"[{job.name}] ✗ Job cancelled before start")
+            return True
+        return False
 
-    def run(self, job, output_queue=None):
-        """Execute a job with timeout and proper error handling."""
+    def _logger(self, output_queue):
+        """Return a log function batching lines to the queue, or stdout without one.
 
-        def log(msg):
-            if output_queue:
-                output_queue.put(msg)
-            else:
-                print(msg)
+        The queue is a Manager proxy, where every put is a round-trip.
+        """
+        if output_queue:
+            return LogBatcher(output_queue)
+        return print
 
-        start_time = time.time()
+    def _prepare(self, job, log):
+        """Announce the job and load artifacts from its dependencies.
+
+        Returns the artifact bind mounts to add to the container. Warm
+        containers are already running, so their artifacts are linked into
+        the workspace instead.
+        """
         log(f"[{job.name}] Starting job...")
         log(f"[{job.name}] Image: {job.image}")
 
         # Load artifacts from dependencies
+        binds = []
         if job.needs:
             log(f"[{job.name}] Loading artifacts from dependencies...")
-            count = self.artifact_manager.load_artifacts(job.needs)
+            with self._span(job, 'artifact load'):
+                count, binds = self.artifact_manager.load_artifacts(
+                    job.needs, mount=self.containers is None
+                )
             if count > 0:
                 log(f"[{job.name}] Loaded {count} artifact file(s)")
 
+        return binds
+
+    def _container_name(self, job):
+        """Return a unique docker container name for one run of a job."""
+        return f"scarycicd-{safe_name(job.name)}-{uuid.uuid4().hex[:8]}"
+
+    def _open_log(self, job):
+        """Start the job's log file at ``logs/<job>.log`` in the workspace."""
+        self.job_log = JobLog(self.workspace / LOG_DIR / f'{safe_name(job.name)}.log',
+                              self.log_tail or 0)
+
+    def _output(self, job, lines, log):
+        """Record complete output lines; forward them unless only the tail is shown.
+
+        Lines are decoded only here, so invalid UTF-8 is replaced, not fatal.
+        """
+        self.job_log.add_lines(lines)
+        if not self.log_tail:
+            prefix = f"[{job.name}] "
+            for line in lines:
+                log(prefix + line.decode(errors='replace').rstrip())
+
+    def _show_tail(self, job, log):
+        """Print the last lines of a failed job's output."""
+        if not self.log_tail or self.job_log is None or not self.job_log.tail:
+            return
+        shown = len(self.job_log.tail)
+        log(f"[{job.name}] Last {shown} of {self.job_log.lines} line(s), "
+            f"full log in {self.job_log.path}:")
+        for line in self.job_log.tail:
+            log(f"[{job.name}] {line.decode(errors='replace').rstrip()}")
+
+    def _kill_process(self, process):
+        """Kill the docker client and everything in its process group."""
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (AttributeError, ProcessLookupError, PermissionError):
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+
+    @staticmethod
+    def _kill_container(container_name):
+        """Kill a container so its resources are freed, ignoring failures."""
+        try:
+            subprocess.run(
+                ['docker', 'kill', container_name],
+                capture_output=True,
+                timeout=30
+            )
+        except (OSError, subprocess.SubprocessError):
+            pass
+
+    def _command(self, job, container_name, binds=()):
+        """Build the docker command line for a job."""
         script = ' && '.join(job.script)
 
-        cmd = [
+        mounts = ['-v', f'{self.workspace}:/workspace']
+        for host_path, rel_path in binds:
+            mounts += ['-v', f'{host_path}:/workspace/{rel_path}:ro']
+
+        return [
             'docker', 'run', '--rm',
-            '-v', f'{self.workspace}:/workspace',
+            '--name', container_name,
+            *resource_flags(job.cpus, job.memory),
+            *mounts,
             '-w', '/workspace',
             job.image,
             'sh', '-c', script
         ]
 
+    def _launch(self, job, binds):
+        """Return (container_name, command) for running the job.
+
+        With a container pool the job is exec'd into a warm container.
+        """
+        if self.containers is None:
+            container_name = self._container_name(job)
+            return container_name, self._command(job, container_name, binds)
+
+        container_name = self.containers.acquire(job.image, job.cpus, job.memory)
+        script = ' && '.join(job.script)
+        return container_name, [
+            'docker', 'exec',
+            '-w', '/workspace',
+            container_name,
+            'sh', '-c', script
+        ]
+
+    def _check_cache(self, job, start_time, log):
+        """Look the job up in the cache.
+
+        Returns ``(cache_key, result)``; ``result`` is set when the job was
+        restored from the cache and does not need to run.
+        """
+        if self.cache is None:
+            return None, None
+
         try:
+            with self._span(job, 'cache lookup'):
+                cache_key = self.cache.key(job, self.artifact_manager)
+                restored = self.cache.restore(cache_key, job)
+            if restored:
+                self._record(job, 'cache hit', time.time())
+                log(f"[{job.name}] Restored from cache ({cache_key[:12]})")
+                return cache_key, self._finish(job, 0, start_time, log, from_cache=True)
+        except OSError as e:
+            log(f"[{job.name}] Cache unavailable: {e}")
+            return None, None
+
+        return cache_key, None
+
+    def _finish(self, job, returncode, start_time, log, cache_key=None, from_cache=False):
+        """Save artifacts on success and build the job result."""
+        if returncode == 0:
+            # Save artifacts
+            if job.artifacts:
+                log(f"[{job.name}] Saving artifacts...")
+                with self._span(job, 'artifact save'):
+                    count = self.artifact_manager.save_artifacts(job.name, job.artifacts)
+                if count > 0:
+                    log(f"[{job.name}] Saved {count} artifact(s)")
+                stats = self.artifact_manager.last_save_stats
+                if stats and stats['bytes_avoided']:
+                    log(f"[{job.name}] Artifact storage: {stats['reflink']} reflinked, "
+                        f"{stats['hardlink']} hard linked, {stats['copy']} copied, "
+                        f"{stats['dedup']} already stored "
+                        f"({format_size(stats['bytes_avoided'])} not copied)")
+
+            if cache_key is not None and not from_cache:
+                try:
+                    self.cache.store(cache_key, job)
+                except OSError as e:
+                    # The job itself succeeded; only caching it failed
+                    log(f"[{job.name}] Cache unavailable: {e}")
+
+            duration = time.time() - start_time
+            log(f"[{job.name}] ✓ Job completed successfully ({duration:.1f}s)")
+            return (job.name, True, None)
+        else:
+            error_msg = f"Exit code {returncode}"
+            log(f"[{job.name}] ✗ Job failed: {error_msg}")
+            return (job.name, False, error_msg)
+
+    def run(self, job, output_queue=None):
+        """Execute a job with timeout and proper error handling."""
+        log = self._logger(output_queue)
+        self.spans = []
+        self.output_queue = output_queue
+        with self._span(job, 'job'):
+            result = self._execute(job, log)
+        if not result[1]:
+            self._show_tail(job, log)
+        if output_queue:
+            log.close()
+        self._emit_spans(output_queue)
+        return result
+
+    def _execute(self, job, log):
+        start_time = time.time()
+        binds = self._prepare(job, log)
+
+        cache_key, result = self._check_cache(job, start_time, log)
+        if result is not None:
+            return result
+
+        if self._is_cancelled(job, log):
+            return (job.name, False, "Cancelled")
+
+        container_name = None
+        healthy = False
+        timed_out = threading.Event()
+
+        def expire():
+            timed_out.set()
+            self._kill_container(container_name)
+            self._kill_process(process)
+
+        try:
+            self._open_log(job)
+            launch_start = time.time()
+            container_name, command = self._launch(job, binds)
             process = subprocess.Popen(
-                cmd,
+                command,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1
+                bufsize=0,
+                start_new_session=True
             )
+            self._announce(job, container_name)
 
-            # Read output with timeout
-            start = time.time()
-            for line in process.stdout:
-                if time.time() - start > job.timeout:
-                    process.kill()
-                    log(f"[{job.name}] ✗ Job timed out after {job.timeout}s")
-                    return (job.name, False, "Timeout")
+            # The watchdog fires even if the job never prints anything
+            watchdog = threading.Timer(job.timeout, expire)
+            watchdog.daemon = True
+            watchdog.start()
+            try:
+                self._stream(job, process, log, launch_start)
+            finally:
+                watchdog.cancel()
 
-                log(f"[{job.name}] {line.rstrip()}")
+            if timed_out.is_set():
+                log(f"[{job.name}] ✗ Job timed out after {job.timeout}s")
+                return (job.name, False, "Timeout")
 
-            process.wait()
+            healthy = process.returncode == 0
+            return self._finish(job, process.returncode, start_time, log, cache_key)
 
-            if process.returncode == 0:
-                # Save artifacts
-                if job.artifacts:
-                    log(f"[{job.name}] Saving artifacts...")
-                    count = self.artifact_manager.save_artifacts(job.name, job.artifacts)
-                    if count > 0:
-                        log(f"[{job.name}] Saved {count} artifact(s)")
+        except Exception as e:
+            error_msg = str(e)
+            log(f"[{job.name}] ✗ Error: {error_msg}")
+            return (job.name, False, error_msg)
 
-                duration = time.time() - start_time
-                log(f"[{job.name}] ✓ Job completed successfully ({duration:.1f}s)")
-                return (job.name, True, None)
-            else:
-                error_msg = f"Exit code {process.returncode}"
-                log(f"[{job.name}] ✗ Job failed: {error_msg}")
-                return (job.name, False, error_msg)
+        finally:
+            if self.job_log is not None:
+                self.job_log.close()
+            if self.containers is not None and container_name:
+                self.containers.release(container_name, job.image, healthy, job.cpus, job.memory)
+
+
+class AsyncJobExecutor(JobExecutor):
+    """Executes a job in a Docker container from an asyncio event loop."""
+
+    async def _kill_container_async(self, container_name):
+        """Kill a container without blocking the event loop."""
+        try:
+            killer = await asyncio.create_subprocess_exec(
+                'docker', 'kill', container_name,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            await asyncio.wait_for(killer.wait(), timeout=30)
+        except (OSError, asyncio.TimeoutError):
+            pass
+
+    def _logger(self, output_queue):
+        """Return a log function putting lines on the queue, or stdout without one.
+
+        The queue is in-process, so batching would only add a flusher thread
+        per job and delay the lines.
+        """
+        if output_queue:
+            return output_queue.put
+        return print
+
+    async def _stream(self, job, process, log, launch_start):
+        """Forward container output until the process exits."""
+        splitter = LineSplitter(self.LINE_LIMIT)
+        running_since = None
+        try:
+            while chunk := await process.stdout.read(self.READ_SIZE):
+                if running_since is None:
+                    running_since = self._container_started(job, launch_start)
+                self.job_log.write(chunk)
+                self._output(job, splitter.feed(chunk), log)
+            self._output(job, splitter.finish(), log)
+            if running_since is None:
+                running_since = self._container_started(job, launch_start, output=False)
+            return await process.wait()
+        finally:
+            if running_since is not None:
+                self._record(job, 'script run', running_since, time.time())
 
+    async def run(self, job, output_queue=None):
+        """Execute a job with timeout and proper error handling."""
+        log = self._logger(output_queue)
+        self.spans = []
+        self.output_queue = output_queue
+        with self._span(job, 'job'):
+            result = await self._execute(job, log)
+        if not result[1]:
+            self._show_tail(job, log)
+        self._emit_spans(output_queue)
+        return result
+
+    async def _execute(self, job, log):
+        # Artifact, cache and docker calls block, so they run in threads
+        # to keep the other jobs on the loop streaming
+        start_time = time.time()
+        binds = await asyncio.to_thread(self._prepare, job, log)
+
+        cache_key, result = await asyncio.to_thread(self._check_cache, job, start_time, log)
+        if result is not None:
+            return result
+
+        if self._is_cancelled(job, log):
+            return (job.name, False, "Cancelled")
+
+        container_name = None
+        healthy = False
+        process = None
+        try:
+            self._open_log(job)
+            launch_start = time.time()
+            container_name, command = await asyncio.to_thread(self._launch, job, binds)
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                limit=self.LINE_LIMIT,
+                start_new_session=True
+            )
+            self._announce(job, container_name)
+
+            try:
+                returncode = await asyncio.wait_for(
+                    self._stream(job, process, log, launch_start), timeout=job.timeout
+                )
+            except asyncio.TimeoutError:
+                await self._kill_container_async(container_name)
+                self._kill_process(process)
+                await process.wait()
+                log(f"[{job.name}] ✗ Job timed out after {job.timeout}s")
+                return (job.name, False, "Timeout")
+
+            healthy = returncode == 0
+            return await asyncio.to_thread(
+                self._finish, job, returncode, start_time, log, cache_key
+            )
+
+        except asyncio.CancelledError:
+            if process and process.returncode is None:
+                self._kill_process(process)
+                await self._kill_container_async(container_name)
+            raise
         except Exception as e:
             error_msg = str(e)
             log(f"[{job.name}] ✗ Error: {error_msg}")
             return (job.name, False, error_msg)
 
+        finally:
+            if self.job_log is not None:
+                self.job_log.close()
+            if self.containers is not None and container_name:
+                await asyncio.to_thread(
+                    self.containers.release, container_name, job.image, healthy,
+                    job.cpus, job.memory
+                )
+
 
-def run_job_parallel(job, workspace, artifact_manager, output_queue):
+# Control events sent on the output queue next to plain log lines
+_JOB_DONE = '__job_done__'
+_JOB_SPANS = '__job_spans__'
+_JOB_CONTAINER = '__job_container__'
+_JOB_LINES = '__job_lines__'
+
+
+# Warm container pools of this worker process, by run id
+_process_containers = {}
+
+
+def run_job_parallel(job, workspace, artifact_manager, output_queue, cache=None,
+                     containers=None, cancelled=None, log_tail=None):
     """Helper function for parallel execution."""
-    executor = JobExecutor(workspace, artifact_manager)
+    if containers is not None:
+        # Reuse the containers this worker started for earlier jobs
+        containers = _process_containers.setdefault(containers.run_id, containers)
+    executor = JobExecutor(workspace, artifact_manager, cache, containers, cancelled, log_tail)
     return executor.run(job, output_queue)
 
 
+class _Cancellable:
+    """Kills the containers of cancelled jobs; shared by the worker pools.
+
+    Subclasses set ``cancelled`` (a dict the executors can read) and
+    ``job_containers``, and pass every event through ``_track``.
+    """
+
+    def cancel(self, job_name):
+        """Stop a submitted job, killing its container if it has started."""
+        self.cancelled[job_name] = True
+        container_name = self.job_containers.pop(job_name, None)
+        if container_name:
+            self._kill(container_name)
+
+    def _kill(self, container_name):
+        threading.Thread(
+            target=JobExecutor._kill_container, args=(container_name,), daemon=True
+        ).start()
+
+    def _track(self, message):
+        """Record a container start event; return True if it was one."""
+        if not (isinstance(message, tuple) and message[0] == _JOB_CONTAINER):
+            return False
+        job_name, container_name = message[1]
+        if job_name in self.cancelled:
+            # Cancelled while the container was starting
+            self._kill(container_name)
+        else:
+            self.job_containers[job_name] = container_name
+        return True
+
+    def _note(self, message):
+        """Update the tracked containers from an event; return True if it is internal."""
+        if self._track(message):
+            return True
+        if isinstance(message, tuple) and message[0] == _JOB_DONE:
+            self.job_containers.pop(message[1][0], None)
+        return False
+
+    def _drain(self):
+        """Read the queued events without waiting, tracking their containers."""
+        try:
+            while True:
+                self._note(self.output_queue.get_nowait())
+        except (queue.Empty, OSError, EOFError):
+            pass
+
+    def next_event(self):
+        """Return the next log line or job completion event."""
+        while True:
+            message = self.output_queue.get()
+            if not self._note(message):
+                return message
+
+    def _kill_running(self):
+        """Kill the container of every job still running and wait for docker.
+
+        Job scripts run in their own session, so an interrupt of the
+        coordinator does not reach them; without this they outlive the run.
+        Events still queued are read first so no container is missed.
+        """
+        # A get() interrupted by Ctrl-C leaves this thread's manager
+        # connection out of step; proxies open a new one per thread
+        drainer = threading.Thread(target=self._drain, daemon=True)
+        drainer.start()
+        drainer.join(timeout=10)
+
+        killers = [
+            threading.Thread(target=JobExecutor._kill_container, args=(container_name,))
+            for container_name in list(self.job_containers.values())
+        ]
+        for killer in killers:
+            killer.start()
+        for killer in killers:
+            killer.join()
+        self.job_containers.clear()
+
+
+class WorkerPool(_Cancellable):
+    """Worker processes shared by every batch of a pipeline run."""
+
+    def __init__(self, workspace, artifact_manager, processes, cache=None, containers=None,
+                 log_tail=None):
+        self.workspace = workspace
+        self.artifact_manager = artifact_manager
+        self.processes = processes
+        self.cache = cache
+        self.containers = containers
+        self.log_tail = log_tail
+        self.manager = multiprocessing.Manager()
+        self.output_queue = self.manager.Queue()
+        self.cancelled = self.manager.dict()
+        self.job_containers = {}
+        self.pool = multiprocessing.Pool(processes=processes)
+
+    def submit(self, job):
+        """Queue a job; its result arrives as a (_JOB_DONE, result) event."""
+        self.pool.apply_async(
+            run_job_parallel,
+            (job, self.workspace, self.artifact_manager, self.output_queue, self.cache,
+             self.containers, self.cancelled, self.log_tail),
+            callback=lambda result: self.output_queue.put((_JOB_DONE, result)),
+            error_callback=lambda e: self.output_queue.put(
+                (_JOB_DONE, (job.name, False, str(e)))
+            ),
+        )
+
+    def close(self):
+        """Kill running jobs' containers, then stop the worker processes and the queue manager."""
+        self._kill_running()
+        self.pool.terminate()
+        self.pool.join()
+        self.manager.shutdown()
+        if self.containers is not None:
+            self.containers.remove_all()
+
+
+class AsyncWorkerPool(_Cancellable):
+    """Supervises jobs from one asyncio event loop instead of worker processes.
+
+    Exposes the same submit / next_event / cancel / close interface as
+    WorkerPool.
+    """
+
+    def __init__(self, workspace, artifact_manager, processes, cache=None, containers=None,
+                 log_tail=None):
+        self.workspace = workspace
+        self.artifact_manager = artifact_manager
+        self.processes = processes
+        self.cache = cache
+        self.containers = containers
+        self.log_tail = log_tail
+        self.output_queue = queue.Queue()
+        self.cancelled = {}
+        self.job_containers = {}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.slots = self._call(self._make_slots())
+
+    def _call(self, coro):
+        """Run a coroutine on the event loop thread and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def _make_slots(self):
+        return asyncio.Semaphore(self.processes)
+
+    async def _run(self, job):
+        async with self.slots:
+            executor = AsyncJobExecutor(
+                self.workspace, self.artifact_manager, self.cache, self.containers,
+                self.cancelled, self.log_tail
+            )
+            try:
+                result = await executor.run(job, self.output_queue)
+            except Exception as e:
+                result = (job.name, False, str(e))
+        self.output_queue.put((_JOB_DONE, result))
+
+    def submit(self, job):
+        """Queue a job; its result arrives as a (_JOB_DONE, result) event."""
+        asyncio.run_coroutine_threadsafe(self._run(job), self.loop)
+
+    async def _cancel_all(self):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self):
+        """Cancel unfinished jobs and stop the event loop."""
+        self._call(self._cancel_all())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        if self.containers is not None:
+            self.containers.remove_all()
+
+
+def host_memory():
+    """Return the physical memory of the host in bytes, or None if unknown."""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class ResourceLimiter:
+    """Admits jobs only while the run's concurrency and resource limits allow.
+
+    Limits are a total job count, CPU and memory budgets matched against
+    each job's ``resources``, a per-image job count, and one running job
+    per ``resource_group``. A job is always admitted when nothing else is
+    running, so one that asks for more than the budget still runs alone.
+    """
+
+    def __init__(self, max_parallel, cpus=None, memory=None, per_image=None):
+        self.max_parallel = max_parallel
+        self.cpus = cpus
+        self.memory = memory
+        self.per_image = per_image or {}
+        self.running = 0
+        self.used_cpus = 0.0
+        self.used_memory = 0
+        self.images = defaultdict(int)
+        self.groups = set()
+
+    def can_start(self, job):
+        if self.running >= self.max_parallel:
+            return False
+        if job.resource_group and job.resource_group in self.groups:
+            return False
+        if job.image in self.per_image and self.images[job.image] >= self.per_image[job.image]:
+            return False
+        if self.running == 0:
+            return True
+        if self.cpus is not None and job.cpus and self.used_cpus + job.cpus > self.cpus:
+            return False
+        if self.memory is not None and job.memory and self.used_memory + job.memory > self.memory:
+            return False
+        return True
+
+    def acquire(self, job):
+        self.running += 1
+        self.used_cpus += job.cpus or 0
+        self.used_memory += job.memory or 0
+        self.images[job.image] += 1
+        if job.resource_group:
+            self.groups.add(job.resource_group)
+
+    def release(self, job):
+        self.running -= 1
+        self.used_cpus -= job.cpus or 0
+        self.used_memory -= job.memory or 0
+        self.images[job.image] -= 1
+        self.groups.discard(job.resource_group)
+
+
+class JobHistory:
+    """Durations and outcomes of past job runs, kept in SQLite."""
+
+    # Number of recent successful runs averaged for an expected duration
+    WINDOW = 10
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path))
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS job_runs ("
+            " run_id TEXT, job TEXT, stage TEXT, started REAL, duration REAL,"
+            " success INTEGER, error TEXT, cached INTEGER)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS job_runs_job ON job_runs (job, started)")
+
+    def expected_durations(self):
+        """Return {job: average duration of its recent successful, uncached runs}."""
+        rows = self.db.execute(
+            "SELECT job, AVG(duration) FROM ("
+            " SELECT job, duration, ROW_NUMBER() OVER"
+            "  (PARTITION BY job ORDER BY started DESC) AS n"
+            " FROM job_runs WHERE success = 1 AND cached = 0"
+            ") WHERE n <= ? GROUP BY job",
+            (self.WINDOW,)
+        )
+        return dict(rows.fetchall())
+
+    def record(self, run_id, runs):
+        """Store (job, stage, started, duration, success, error, cached) rows."""
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO job_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, *run) for run in runs]
+            )
+
+    def close(self):
+        self.db.close()
+
+
+class ImagePrefetcher:
+    """Pulls the pipeline's images in the background while early jobs run.
+
+    Jobs never wait for a prefetch; docker pulls on demand as before. The
+    prefetcher only records when each image was first needed so it can
+    report how much pull time ran ahead of the jobs.
+    """
+
+    def __init__(self, images, concurrency=4):
+        self.pool = futures.ThreadPoolExecutor(max_workers=concurrency)
+        self.needed = {}
+        self.pulls = {}
+        self.processes = set()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.futures = [self.pool.submit(self._pull, image) for image in dict.fromkeys(images)]
+
+    def _pull(self, image):
+        """Pull an image unless it is already present locally."""
+        inspect = subprocess.run(
+            ['docker', 'image', 'inspect', image],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        if inspect.returncode == 0:
+            return
+
+        start = time.time()
+        with self.lock:
+            if self.closed:
+                return
+            process = subprocess.Popen(
+                ['docker', 'pull', '-q', image],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+            self.processes.add(process)
+        try:
+            returncode = process.wait()
+        finally:
+            with self.lock:
+                self.processes.discard(process)
+        if returncode == 0:
+            self.pulls[image] = (start, time.time())
+
+    def note_needed(self, image):
+        """Record the first time a job needs an image."""
+        self.needed.setdefault(image, time.time())
+
+    def summary(self):
+        """Describe how much pull time was hidden behind earlier jobs."""
+        total = hidden = 0.0
+        for image, (start, end) in self.pulls.items():
+            total += end - start
+            hidden += max(0.0, min(end, self.needed.get(image, end)) - start)
+        pending = sum(1 for future in self.futures if not future.done())
+        summary = (f"Prefetched {len(self.pulls)} image(s): {total:.1f}s pulling, "
+                   f"{hidden:.1f}s hidden behind earlier jobs")
+        if pending:
+            summary += f", {pending} still pulling"
+        return summary
+
+    def close(self):
+        """Stop pulls that have not started yet and kill the running ones.
+
+        The pool's threads are not daemons, so a pull left running would
+        hold up interpreter exit until it finished.
+        """
+        with self.lock:
+            self.closed = True
+            for process in self.processes:
+                process.kill()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+BACKENDS = {
+    'process': WorkerPool,
+    'async': AsyncWorkerPool,
+}
+
+
+# Top-level config keys that are not jobs
+RESERVED_KEYS = {'stages', 'variables', 'limits'}
+
+
 class Pipeline:
     """Complete pipeline runner with all features."""
 
+    # Jobs listed by slack after a run; --report has the rest
+    SLACK_ROWS = 10
+
     def __init__(self, config_file):
+        self.tracer = Tracer()
         self.config_file = Path(config_file)
-        self.config = self._load_config()
+        with self.tracer.span('config load'):
+            self.config = self._load_config()
         self.stages = self.config.get('stages', ['test'])
         self.variables = self.config.get('variables', {})
-        self.jobs = self._parse_jobs()
+        self.limits = self.config.get('limits', {})
+        self._check_limits()
+        with self.tracer.span('parse'):
+            self.jobs = self._parse_jobs()
         self.current_branch = get_current_branch()
+        self.prefetcher = None
+        self.priorities = {}
+        self.job_results = {}
+        self.limiter = None
+        self.fail_fast = False
+        self.cancelled = set()
+
+    def _check_limits(self):
+        """Reject limits under which a job could never be admitted."""
+        for key in ('max_parallel', 'cpu'):
+            if key in self.limits and not (
+                    isinstance(self.limits[key], (int, float)) and self.limits[key] > 0):
+                raise ValueError(f"limits: {key} must be a positive number, "
+                                 f"got {self.limits[key]!r}")
+        if 'mem' in self.limits and parse_size(self.limits['mem']) <= 0:
+            raise ValueError(f"limits: mem must be positive, got {self.limits['mem']!r}")
+        for image, count in self.limits.get('images', {}).items():
+            if not isinstance(count, int) or count < 1:
+                raise ValueError(f"limits: images: {image} must be at least 1, got {count!r}")
 
     def _load_config(self):
-        """Load and parse YAML configuration."""
-        with open(self.config_file) as f:
-            return yaml.safe_load(f)
+        """Load and parse YAML configuration.
+
+        Parsed configs are cached in the per-user cache directory, so
+        repeat runs of an unchanged file skip parsing.
+        """
+        cache = ConfigCache(user_cache_dir() / 'config')
+        return cache.load(self.config_file)
 
     def _parse_jobs(self):
-        """Parse jobs from configuration."""
+        """Parse jobs from configuration, expanding ``parallel`` jobs into variants."""
         jobs = []
+        variants = {}
+        substitution = Substitution(self.variables)  # For every job without a matrix
         for job_name, job_config in self.config.items():
-            if job_name not in ['stages', 'variables'] and isinstance(job_config, dict):
-                jobs.append(Job(job_name, job_config, self.variables))
+            if job_name in RESERVED_KEYS or not isinstance(job_config, dict):
+                continue
+            if 'parallel' not in job_config:
+                jobs.append(Job(job_name, job_config, self.variables, substitution=substitution))
+                continue
+            names = variants[job_name] = []
+            for name, matrix_variables in expand_parallel(job_name, job_config['parallel']):
+                jobs.append(Job(name, job_config, self.variables, matrix_variables))
+                names.append(name)
+
+        if variants:
+            # Needing a parallel job means needing all of its variants; jobs
+            # sharing a needs list share the expanded one too
+            expanded = {}
+            for job in jobs:
+                if any(dep in variants for dep in job.needs):
+                    key = id(job.needs)
+                    if key not in expanded:
+                        expanded[key] = [name for dep in job.needs
+                                         for name in variants.get(dep, [dep])]
+                    job.needs = expanded[key]
         return jobs
 
-    def _topological_sort(self, jobs):
-        """Sort jobs in topological order based on dependencies."""
+    def _topological_sort(self, jobs, dependencies=None):
+        """Sort jobs in topological order based on dependencies.
+
+        ``dependencies`` maps job names to the names they wait for and
+        defaults to each job's ``needs``.
+        """
         job_map = {job.name: job for job in jobs}
         in_degree = {job.name: 0 for job in jobs}
         adjacency = defaultdict(list)
 
         for job in jobs:
-            for dep in job.needs:
+            needs = dependencies[job.name] if dependencies is not None else job.needs
+            for dep in needs:
                 if dep in job_map:
                     adjacency[dep].append(job.name)
                     in_degree[job.name] += 1
@@ -280,50 +2168,498 @@ class Pipeline:
                 stages[job.stage].append(job)
         return stages
 
-    def _execute_job_batch(self, jobs, workspace, artifact_manager):
-        """Execute a batch of jobs in parallel."""
-        if len(jobs) == 1:
-            executor = JobExecutor(workspace, artifact_manager)
-            job_name, success, error = executor.run(jobs[0])
-            return [(job_name, success, error)]
-        else:
-            manager = Manager()
-            output_queue = manager.Queue()
-
-            run_func = partial(
-                run_job_parallel,
-                workspace=workspace,
-                artifact_manager=artifact_manager,
-                output_queue=output_queue
+    def _build_dependencies(self, jobs):
+        """Map every job to what it waits for across the whole pipeline.
+
+        Explicit ``needs`` are used as-is. A job without ``needs`` waits for
+        every job in the stages before its own. Rather than an edge to each
+        of those jobs, that is modelled with one barrier node ``('stage',
+        i)`` per stage, which waits for the previous barrier and the jobs of
+        the previous stage, so the graph stays linear in the number of jobs
+        and ``needs`` entries. Barrier nodes are keys of the result as well.
+        """
+        stage_index = {stage: i for i, stage in enumerate(self.stages)}
+        job_names = {job.name for job in jobs}
+        by_stage = defaultdict(list)
+        for job in jobs:
+            by_stage[stage_index[job.stage]].append(job.name)
+
+        dependencies = {}
+        for index in range(len(self.stages)):
+            # Jobs first, so ties on the critical path resolve to a job
+            dependencies[('stage', index)] = (
+                by_stage[index - 1] + [('stage', index - 1)] if index else []
             )
+        for job in jobs:
+            if job.needs:
+                dependencies[job.name] = [dep for dep in job.needs if dep in job_names]
+            else:
+                dependencies[job.name] = [('stage', stage_index[job.stage])]
+        return dependencies
+
+    @staticmethod
+    def _graph_order(dependencies):
+        """Return the nodes of a dependency map in topological order.
+
+        Raises ValueError if the graph has a cycle.
+        """
+        in_degree = {node: len(deps) for node, deps in dependencies.items()}
+        dependents = defaultdict(list)
+        for node, deps in dependencies.items():
+            for dep in deps:
+                dependents[dep].append(node)
+
+        order = []
+        ready = deque(node for node, degree in in_degree.items() if degree == 0)
+        while ready:
+            node = ready.popleft()
+            order.append(node)
+            for dependent in dependents[node]:
+                in_degree[dependent] -= 1
+                if in_degree[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(order) != len(dependencies):
+            raise ValueError("Circular dependency detected in job dependencies")
+        return order
 
-            with Pool(processes=len(jobs)) as pool:
-                results = pool.map_async(run_func, jobs)
+    def _dag_batches(self, jobs):
+        """Return the batches ``_topological_sort`` gives for the whole-pipeline graph.
 
-                while True:
-                    if results.ready() and output_queue.empty():
-                        break
+        Each job goes in the batch of its longest dependency chain; stage
+        barriers add no batch of their own.
+        """
+        dependencies = self._build_dependencies(jobs)
+        level = {}
+        for node in self._graph_order(dependencies):
+            depth = max((level[dep] for dep in dependencies[node]), default=0)
+            level[node] = depth if isinstance(node, tuple) else depth + 1
 
-                    if not output_queue.empty():
-                        print(output_queue.get())
+        batches = defaultdict(list)
+        for job in jobs:
+            batches[level[job.name]].append(job)
+        return [batches[depth] for depth in sorted(batches)]
+
+    def _prioritize(self, jobs, expected):
+        """Rank jobs by the expected length of the longest path they start.
+
+        Jobs without history are assumed to take the average expected
+        duration, so with no history at all the longest chain goes first.
+        """
+        known = [expected[job.name] for job in jobs if job.name in expected]
+        default = sum(known) / len(known) if known else 1.0
+
+        dependencies = self._build_dependencies(jobs)
+        dependents = defaultdict(list)
+        for name, deps in dependencies.items():
+            for dep in deps:
+                dependents[dep].append(name)
+
+        priorities = {}
+        for name in reversed(self._graph_order(dependencies)):
+            tail = max((priorities[child] for child in dependents[name]), default=0.0)
+            duration = 0.0 if isinstance(name, tuple) else expected.get(name, default)
+            priorities[name] = duration + tail
+        return priorities
+
+    def _job_runs(self, jobs):
+        """Summarize each finished job for the history database."""
+        job_spans = {}
+        cached = set()
+        for span in self.tracer.spans:
+            if span['name'] == 'job':
+                job_spans[span['job']] = span
+            elif span['name'] == 'cache hit':
+                cached.add(span['job'])
+
+        runs = []
+        for job in jobs:
+            if job.name not in job_spans or job.name not in self.job_results:
+                continue
+            span = job_spans[job.name]
+            _, success, error = self.job_results[job.name]
+            runs.append((job.name, job.stage, span['start'], span['end'] - span['start'],
+                         int(success), error, int(job.name in cached)))
+        return runs
+
+    def _critical_path(self, jobs):
+        """Analyse the measured job durations over the dependency graph."""
+        durations = {
+            span['job']: span['end'] - span['start']
+            for span in self.tracer.spans
+            if span['name'] == 'job' and span.get('job')
+        }
+        dependencies = self._build_dependencies(jobs)
+        # Stage barriers take no time and are left out of the report
+        durations.update((node, 0.0) for node in dependencies if isinstance(node, tuple))
+        report = critical_path(self._graph_order(dependencies), dependencies, durations)
+        report['path'] = [name for name in report['path'] if not isinstance(name, tuple)]
+        report['jobs'] = {
+            name: info for name, info in report['jobs'].items() if not isinstance(name, tuple)
+        }
+        return report
+
+    def _print_critical_path(self, report):
+        """Print the critical path and the jobs with the least slack."""
+        print(f"\nCritical path ({report['length']:.1f}s): {' → '.join(report['path'])}")
+        jobs = heapq.nsmallest(self.SLACK_ROWS, report['jobs'].items(),
+                               key=lambda item: item[1]['slack'])
+        width = max(len(name) for name, _ in jobs)
+        for name, info in jobs:
+            print(f"  {name:<{width}}  {info['duration']:6.1f}s  slack {info['slack']:6.1f}s")
+        hidden = len(report['jobs']) - len(jobs)
+        if hidden:
+            print(f"  ... {hidden} more job(s); --report FILE writes them all")
+
+    def _submit(self, job, worker_pool):
+        """Hand a job to the worker pool."""
+        if self.prefetcher is not None:
+            self.prefetcher.note_needed(job.image)
+        worker_pool.submit(job)
+
+    def _next_result(self, worker_pool):
+        """Print log lines and collect spans until a job finishes; return its result."""
+        while True:
+            message = worker_pool.next_event()
+            if not isinstance(message, tuple):
+                print(message)
+                continue
+
+            kind, payload = message
+            if kind == _JOB_LINES:
+                print('\n'.join(payload))
+                continue
+            if kind == _JOB_SPANS:
+                self.tracer.extend(payload)
+                continue
+            if payload[0] in self.cancelled and not payload[1]:
+                payload = (payload[0], False, "Cancelled")
+            self.job_results[payload[0]] = payload
+            return payload
+
+    def _cancel_running(self, running, worker_pool, failed_job):
+        """Cancel the running jobs once a failure has doomed the pipeline."""
+        for name in running - self.cancelled:
+            print(f"[{name}] Cancelling: '{failed_job}' failed")
+            self.cancelled.add(name)
+            worker_pool.cancel(name)
+
+    def _execute_dag(self, jobs, worker_pool):
+        """Execute jobs as one graph, starting each once its dependencies succeed."""
+        with self.tracer.span('topo sort'):
+            dependencies = self._build_dependencies(jobs)
+            self._graph_order(dependencies)
+
+        return self._execute_graph(jobs, dependencies, worker_pool)
+
+    def _execute_job_batch(self, jobs, worker_pool):
+        """Execute a batch of independent jobs in parallel."""
+        return self._execute_graph(jobs, {job.name: [] for job in jobs}, worker_pool)
+
+    def _execute_graph(self, jobs, dependencies, worker_pool):
+        """Run jobs as their dependencies succeed and the limiter admits them.
+
+        Ready jobs start longest expected path first, then in file order.
+        Once a job fails no new jobs start; the ones never started are
+        reported as skipped. With ``fail_fast`` the running jobs are
+        cancelled as well. Failures of ``allow_failure`` jobs are ignored.
+        Stage barrier nodes in ``dependencies`` complete as soon as
+        everything they wait for has.
+        """
+        job_map = {job.name: job for job in jobs}
+        position = {job.name: index for index, job in enumerate(jobs)}
+        waiting = {name: len(deps) for name, deps in dependencies.items()}
+        dependents = defaultdict(list)
+        for name, deps in dependencies.items():
+            for dep in deps:
+                dependents[dep].append(name)
+
+        def entry(job):
+            return (-self.priorities.get(job.name, 0), position[job.name], job)
+
+        ready = []
+
+        def resolve(name):
+            """Count a finished node against its dependents; barriers pass straight through."""
+            finished = [name]
+            while finished:
+                for dependent in dependents[finished.pop()]:
+                    waiting[dependent] -= 1
+                    if waiting[dependent] == 0:
+                        if isinstance(dependent, tuple):
+                            finished.append(dependent)
+                        else:
+                            heapq.heappush(ready, entry(job_map[dependent]))
+
+        for name, count in list(waiting.items()):
+            if count == 0:
+                if isinstance(name, tuple):
+                    resolve(name)
+                else:
+                    heapq.heappush(ready, entry(job_map[name]))
+
+        job_results = []
+        running = set()
+        failed = False
+
+        while ready or self.limiter.running:
+            blocked = []
+            while ready and not failed and self.limiter.running < self.limiter.max_parallel:
+                item = heapq.heappop(ready)
+                job = item[2]
+                if not self.limiter.can_start(job):
+                    blocked.append(item)
+                    continue
+                self.limiter.acquire(job)
+                running.add(job.name)
+                self._submit(job, worker_pool)
+            for item in blocked:
+                heapq.heappush(ready, item)
+
+            if not self.limiter.running:
+                if ready and not failed:
+                    # Nothing runs and nothing can start: the limits admit none of them
+                    for _, _, job in ready:
+                        job_results.append((job.name, False, "Not admitted by limits"))
+                break
+
+            # Block until the next log line or completion instead of polling
+            result = self._next_result(worker_pool)
+            job_results.append(result)
+            job_name, success, error = result
+            running.discard(job_name)
+            self.limiter.release(job_map[job_name])
+
+            if not success and job_map[job_name].allow_failure:
+                print(f"[{job_name}] ⚠ Failure allowed, continuing")
+            elif not success and error != "Cancelled":
+                failed = True
+                if self.fail_fast:
+                    self._cancel_running(running, worker_pool, job_name)
+            if failed:
+                continue
+
+            resolve(job_name)
 
-                return results.get()
+        finished = {name for name, _, _ in job_results}
+        for job in jobs:
+            if job.name not in finished:
+                job_results.append((job.name, False, "Skipped"))
+
+        return job_results
+
+    def _run_stages(self, stages_with_jobs, worker_pool):
+        """Run stages in order, each as batches of independent jobs."""
+        for stage in self.stages:
+            stage_jobs = stages_with_jobs.get(stage, [])
+
+            if not stage_jobs:
+                continue
+
+            print(f"\n{'─'*60}")
+            print(f"Stage: {stage} ({len(stage_jobs)} job(s))")
+            print(f"{'─'*60}\n")
+
+            try:
+                with self.tracer.span('topo sort', stage=stage):
+                    execution_batches = self._topological_sort(stage_jobs)
+            except ValueError as e:
+                print(f"✗ Error: {e}")
+                return False
+
+            for batch in execution_batches:
+                job_results = self._execute_job_batch(batch, worker_pool)
+                if not self._check_results(job_results, f"✗ Pipeline failed at stage '{stage}'"):
+                    return False
 
-    def run(self, workspace='.'):
-        """Execute complete pipeline."""
+        return True
+
+    def _run_dag(self, stages_with_jobs, worker_pool):
+        """Run all stages as a single dependency graph."""
+        jobs = [job for stage in self.stages for job in stages_with_jobs.get(stage, [])]
+
+        try:
+            job_results = self._execute_dag(jobs, worker_pool)
+        except ValueError as e:
+            print(f"✗ Error: {e}")
+            return False
+
+        return self._check_results(job_results, "✗ Pipeline failed")
+
+    def _check_results(self, job_results, title):
+        """Print a summary under ``title`` if a job failed; return True if none did."""
+        allowed = {job.name for job in self.jobs if job.allow_failure}
+        failed_jobs = [name for name, success, error in job_results
+                       if not success and error not in ("Skipped", "Cancelled")
+                       and name not in allowed]
+        if not failed_jobs:
+            return True
+
+        cancelled_jobs = [name for name, _, error in job_results if error == "Cancelled"]
+        skipped_jobs = [name for name, _, error in job_results if error == "Skipped"]
+        print(f"\n{'='*60}")
+        print(title)
+        print(f"  Failed jobs: {', '.join(failed_jobs)}")
+        if cancelled_jobs:
+            print(f"  Cancelled jobs: {', '.join(cancelled_jobs)}")
+        if skipped_jobs:
+            print(f"  Skipped jobs: {', '.join(skipped_jobs)}")
+        print(f"{'='*60}\n")
+        return False
+
+    def _max_parallel(self, max_parallel, total_jobs):
+        """Resolve how many jobs may run at once: --jobs, then limits, then CPUs."""
+        max_parallel = max_parallel or self.limits.get('max_parallel') or max(4, os.cpu_count() or 1)
+        return min(max_parallel, total_jobs)
+
+    def _make_limiter(self, max_parallel):
+        """Return a ResourceLimiter for the config's ``limits``."""
+        return ResourceLimiter(
+            max_parallel,
+            cpus=float(self.limits.get('cpu', os.cpu_count() or 1)),
+            memory=parse_size(self.limits['mem']) if 'mem' in self.limits else host_memory(),
+            per_image=self.limits.get('images'),
+        )
+
+    def _concurrency(self, batch, max_parallel):
+        """Return how many jobs of a batch the limits let start together."""
+        limiter = self._make_limiter(max_parallel)
+        for job in batch:
+            if limiter.can_start(job):
+                limiter.acquire(job)
+        return limiter.running
+
+    def plan(self, dag=False, max_parallel=None):
+        """Work out what ``run`` would execute, without starting any container.
+
+        Returns a dict of the batches in order, how many jobs of each the
+        limits let start together, the images used, the artifact edges between jobs, the
+        jobs the branch filter drops and any errors that would stop the run.
+        """
+        stages_with_jobs = self._group_jobs_by_stage()
+        run_jobs = [job for stage in self.stages for job in stages_with_jobs.get(stage, [])]
+        max_parallel = self._max_parallel(max_parallel, len(run_jobs)) if run_jobs else 0
+
+        errors = []
+        known_stages = set(self.stages)
+        defined = {job.name for job in self.jobs}
+        for job in self.jobs:
+            if job.stage not in known_stages:
+                errors.append(f"Job '{job.name}' has stage '{job.stage}', which is not in 'stages'")
+            for dep in job.needs:
+                if dep not in defined:
+                    errors.append(f"Job '{job.name}' needs '{dep}', which is not defined")
+
+        batches = []
+        try:
+            if dag:
+                for batch in self._dag_batches(run_jobs):
+                    batches.append((None, batch))
+            else:
+                for stage in self.stages:
+                    for batch in self._topological_sort(stages_with_jobs.get(stage, [])):
+                        batches.append((stage, batch))
+        except ValueError as e:
+            errors.append(str(e))
+
+        images = defaultdict(int)
+        for job in run_jobs:
+            images[job.image] += 1
+
+        job_map = {job.name: job for job in run_jobs}
+        artifacts = [
+            {'from': dep, 'to': job.name, 'paths': job_map[dep].artifacts}
+            for job in run_jobs
+            for dep in job.needs
+            if dep in job_map and job_map[dep].artifacts
+        ]
+
+        return {
+            'schedule': 'dag' if dag else 'stage',
+            'branch': self.current_branch,
+            'max_parallel': max_parallel,
+            'jobs': len(run_jobs),
+            'filtered': [job.name for job in self.jobs if not job.should_run(self.current_branch)],
+            'batches': [
+                {
+                    'stage': stage,
+                    'jobs': [job.name for job in batch],
+                    'concurrency': self._concurrency(batch, max_parallel),
+                }
+                for stage, batch in batches
+            ],
+            'images': dict(images),
+            'artifacts': artifacts,
+            'errors': errors,
+        }
+
+    @staticmethod
+    def print_plan(plan):
+        """Print a plan from ``plan`` for people."""
+        print(f"Plan: {plan['jobs']} job(s), {plan['schedule']} schedule, "
+              f"branch {plan['branch']}, at most {plan['max_parallel']} at once")
+        if plan['filtered']:
+            print(f"  Not on this branch: {', '.join(plan['filtered'])}")
+
+        print(f"\nBatches ({len(plan['batches'])}):")
+        for index, batch in enumerate(plan['batches'], 1):
+            where = f"[{batch['stage']}] " if batch['stage'] else ""
+            print(f"  {index}. {where}{len(batch['jobs'])} job(s), {batch['concurrency']} at once: "
+                  f"{', '.join(batch['jobs'])}")
+
+        print(f"\nImages ({len(plan['images'])}):")
+        for image, count in sorted(plan['images'].items(), key=lambda item: -item[1]):
+            print(f"  {image}  ({count} job(s))")
+
+        if plan['artifacts']:
+            print(f"\nArtifact edges ({len(plan['artifacts'])}):")
+            for edge in plan['artifacts']:
+                print(f"  {edge['from']} → {edge['to']}: {', '.join(edge['paths'])}")
+
+        for error in plan['errors']:
+            print(f"✗ Error: {error}")
+
+    def run(self, workspace='.', dag=False, max_parallel=None, backend='process',
+            cache_size=None, link_artifacts=False, io_workers=None, warm_uses=None,
+            prefetch=None, trace=None, report=None, history=True, fail_fast=False,
+            log_tail=None):
+        """Execute complete pipeline.
+
+        With ``dag`` the whole pipeline is scheduled as one dependency graph
+        instead of running stage by stage. ``max_parallel`` caps how many
+        jobs run at once; it defaults to ``limits: max_parallel`` from the
+        config, else the CPU count (at least 4). ``limits`` may also set
+        ``cpu`` and ``mem`` budgets and ``images`` counts per image.
+        ``backend`` selects how jobs are supervised, see ``BACKENDS``.
+        Passing ``cache_size`` (in bytes) enables the job result cache.
+        ``link_artifacts`` stores artifacts by reflink or hard link when the
+        filesystem allows it instead of copying them. ``io_workers`` sets
+        how many threads hash and store artifact files (default: serial). With ``warm_uses``
+        jobs are exec'd into pre-started containers, each recycled after
+        that many jobs. ``prefetch`` is the number of concurrent image pulls
+        started before the first job; None disables prefetching. ``trace``
+        is a path to write a Chrome trace of the run to, ``report`` one for
+        the critical path report as JSON. With ``history`` job durations
+        are recorded in ``.scarycicd/history.db`` and used to start the
+        longest expected path first. With ``fail_fast`` the first failure
+        kills the containers of the jobs still running. Job output always
+        goes to ``logs/<job>.log``; with ``log_tail`` it is not streamed to
+        the console and only that many last lines of failed jobs are shown.
+        """
         print(f"\n{'='*60}")
         print(f"ScaryCICD v0x00")
         print(f"{'='*60}")
         print(f"Config: {self.config_file.name}")
         print(f"Branch: {self.current_branch}")
         print(f"Stages: {' → '.join(self.stages)}")
+        print(f"Schedule: {'dag' if dag else 'stage'}")
         print(f"Total jobs: {len(self.jobs)}")
         if self.variables:
             print(f"Variables: {', '.join(f'{k}={v}' for k, v in self.variables.items())}")
         print(f"{'='*60}\n")
 
         workspace = Path(workspace).resolve()
-        artifact_manager = ArtifactManager(workspace)
+        artifact_manager = ArtifactManager(workspace, link=link_artifacts, io_workers=io_workers)
         stages_with_jobs = self._group_jobs_by_stage()
 
         # Count jobs that will run
@@ -333,34 +2669,46 @@ class Pipeline:
             return True
 
         pipeline_start = time.time()
+        self.fail_fast = fail_fast
+        if prefetch:
+            images = [job.image for stage in self.stages for job in stages_with_jobs.get(stage, [])]
+            self.prefetcher = ImagePrefetcher(images, prefetch)
+        cache = JobCache(workspace, cache_size) if cache_size else None
+        containers = ContainerPool(workspace, warm_uses) if warm_uses else None
+        max_parallel = self._max_parallel(max_parallel, total_jobs)
+        self.limiter = self._make_limiter(max_parallel)
+        worker_pool = BACKENDS[backend](
+            workspace, artifact_manager, max_parallel, cache, containers, log_tail
+        )
+        run_jobs = [job for stage in self.stages for job in stages_with_jobs.get(stage, [])]
+        job_history = JobHistory(workspace / '.scarycicd' / 'history.db') if history else None
+        if job_history is not None:
+            try:
+                self.priorities = self._prioritize(run_jobs, job_history.expected_durations())
+            except ValueError:
+                # Circular dependencies are reported by the scheduler
+                self.priorities = {}
 
         try:
-            for stage in self.stages:
-                stage_jobs = stages_with_jobs.get(stage, [])
-
-                if not stage_jobs:
-                    continue
-
-                print(f"\n{'─'*60}")
-                print(f"Stage: {stage} ({len(stage_jobs)} job(s))")
-                print(f"{'─'*60}\n")
-
-                try:
-                    execution_batches = self._topological_sort(stage_jobs)
-                except ValueError as e:
-                    print(f"✗ Error: {e}")
-                    return False
-
-                for batch in execution_batches:
-                    job_results = self._execute_job_batch(batch, workspace, artifact_manager)
-
-                    if not all(success for _, success, _ in job_results):
-                        failed_jobs = [name for name, success, _ in job_results if not success]
-                        print(f"\n{'='*60}")
-                        print(f"✗ Pipeline failed at stage '{stage}'")
-                        print(f"  Failed jobs: {', '.join(failed_jobs)}")
-                        print(f"{'='*60}\n")
-                        return False
+            if dag:
+                success = self._run_dag(stages_with_jobs, worker_pool)
+            else:
+                success = self._run_stages(stages_with_jobs, worker_pool)
+            if self.prefetcher is not None:
+                print(f"\n{self.prefetcher.summary()}")
+
+            try:
+                analysis = self._critical_path(run_jobs)
+            except ValueError:
+                analysis = None
+            if analysis and analysis['jobs']:
+                self._print_critical_path(analysis)
+                if report:
+                    with open(report, 'w') as f:
+                        json.dump(analysis, f, indent=2)
+
+            if not success:
+                return False
 
             duration = time.time() - pipeline_start
             print(f"\n{'='*60}")
@@ -371,30 +2719,162 @@ class Pipeline:
             return True
 
         finally:
-            artifact_manager.cleanup()
+            with self.tracer.span('cleanup'):
+                if self.prefetcher is not None:
+                    self.prefetcher.close()
+                worker_pool.close()
+                artifact_manager.cleanup()
+                if job_history is not None:
+                    job_history.record(uuid.uuid4().hex[:12], self._job_runs(run_jobs))
+                    job_history.close()
+            if trace:
+                self.tracer.write(trace)
+                print(f"Trace written to {trace}")
+
+
+VALUE_OPTIONS = {
+    'jobs', 'backend', 'cache-size', 'io-workers', 'warm-uses', 'prefetch-jobs', 'trace',
+    'report', 'log-tail',
+}
+FLAG_OPTIONS = {
+    'dag', 'cache', 'link-artifacts', 'warm', 'prefetch', 'no-history', 'fail-fast', 'help',
+    'plan', 'plan-json',
+}
+
+
+def parse_args(argv):
+    """Split command line arguments into positionals and --options."""
+    positional = []
+    options = {}
+    args = iter(argv)
+    for arg in args:
+        if not arg.startswith('--'):
+            positional.append(arg)
+            continue
+
+        name, has_value, value = arg[2:].partition('=')
+        if name in VALUE_OPTIONS and not has_value:
+            value = next(args, None)
+            if value is None:
+                raise ValueError(f"Option '--{name}' requires a value")
+        elif name not in VALUE_OPTIONS:
+            if name not in FLAG_OPTIONS or has_value:
+                raise ValueError(f"Unknown option '{arg}'")
+            value = True
+        options[name] = value
+
+    return positional, options
 
 
 def main():
     """CLI entry point."""
-    if len(sys.argv) < 2:
+    try:
+        positional, options = parse_args(sys.argv[1:])
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if not positional or 'help' in options:
         print("ScaryCICD - A scary CI/CD scaryline runner")
         print("\nUsage:")
-        print("  python scarycicd.py <scaryline.yml> [workspace]")
+        print("  python scarycicd.py <scaryline.yml> [workspace] [options]")
+        print("\nOptions:")
+        print("  --dag             Schedule all stages as one graph built from 'needs'")
+        print("  --jobs N          Run at most N jobs at once (default: CPU count, at least 4)")
+        print("  --backend NAME    Job supervisor: 'process' (default) or 'async'")
+        print("  --cache           Skip jobs whose inputs match a cached successful run")
+        print("  --cache-size SIZE Cache size limit, e.g. 512M (default: 1G, implies --cache)")
+        print("  --link-artifacts  Store artifacts by reflink or hard link instead of copying")
+        print("  --io-workers N    Threads used to hash and store artifact files (default: 1)")
+        print("  --warm            Run jobs with docker exec in pre-started containers")
+        print("  --warm-uses N     Jobs per warm container before it is recycled (default: 10)")
+        print("  --prefetch        Pull all images in the background as the run starts")
+        print("  --prefetch-jobs N Concurrent image pulls (default: 4, implies --prefetch)")
+        print("  --trace FILE      Write a Chrome trace (open in Perfetto) of the run")
+        print("  --report FILE     Write the critical path and job slack as JSON")
+        print("  --no-history      Do not record or use job durations in .scarycicd/history.db")
+        print("  --fail-fast       Kill running jobs as soon as one fails")
+        print("  --log-tail N      Do not stream job output; show the last N lines of failed jobs")
+        print("  --plan            Print the batches, images and artifact edges without running")
+        print("  --plan-json       Same as --plan, as JSON")
         print("\nExample:")
         print("  python scarycicd.py .gitlab-ci.yml")
         print("  python scarycicd.py scaryline.yml /path/to/workspace")
-        sys.exit(1)
+        print("  python scarycicd.py scaryline.yml --dag")
+        sys.exit(0 if 'help' in options else 1)
 
-    config_file = sys.argv[1]
-    workspace = sys.argv[2] if len(sys.argv) > 2 else '.'
+    config_file = positional[0]
+    workspace = positional[1] if len(positional) > 1 else '.'
+
+    counts = {}
+    for name in ('jobs', 'io-workers', 'warm-uses', 'prefetch-jobs', 'log-tail'):
+        if name not in options:
+            continue
+        try:
+            counts[name] = int(options[name])
+        except ValueError:
+            print(f"Error: --{name} expects a number, got '{options[name]}'")
+            sys.exit(1)
+        if counts[name] < 1:
+            print(f"Error: --{name} must be at least 1")
+            sys.exit(1)
+
+    cache_size = None
+    if 'cache' in options or 'cache-size' in options:
+        try:
+            cache_size = parse_size(options.get('cache-size', JobCache.DEFAULT_MAX_BYTES))
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    warm_uses = None
+    if 'warm' in options or 'warm-uses' in options:
+        warm_uses = counts.get('warm-uses', 10)
+
+    prefetch = None
+    if 'prefetch' in options or 'prefetch-jobs' in options:
+        prefetch = counts.get('prefetch-jobs', 4)
+
+    backend = options.get('backend', 'process')
+    if backend not in BACKENDS:
+        print(f"Error: Unknown backend '{backend}' (choose from {', '.join(BACKENDS)})")
+        sys.exit(1)
 
     if not Path(config_file).exists():
         print(f"Error: Config file '{config_file}' not found")
         sys.exit(1)
 
     try:
-        pipeline = Pipeline(config_file)
-        success = pipeline.run(workspace)
+        try:
+            pipeline = Pipeline(config_file)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        if 'plan' in options or 'plan-json' in options:
+            plan = pipeline.plan(dag=options.get('dag', False), max_parallel=counts.get('jobs'))
+            if 'plan-json' in options:
+                # One-shot dumps uses the C encoder; dump to a stream does not
+                print(json.dumps(plan, ensure_ascii=False))
+            else:
+                pipeline.print_plan(plan)
+            sys.exit(1 if plan['errors'] else 0)
+
+        success = pipeline.run(
+            workspace,
+            dag=options.get('dag', False),
+            max_parallel=counts.get('jobs'),
+            backend=backend,
+            cache_size=cache_size,
+            link_artifacts=options.get('link-artifacts', False),
+            io_workers=counts.get('io-workers'),
+            warm_uses=warm_uses,
+            prefetch=prefetch,
+            trace=options.get('trace'),
+            report=options.get('report'),
+            history=not options.get('no-history', False),
+            fail_fast=options.get('fail-fast', False),
+            log_tail=counts.get('log-tail'),
+        )
         sys.exit(0 if success else 1)
     except Exception as e:
         print(f"Fatal error: {e}")
@@ -0,0 +1,96 @@
+"""
+Fixtures running scarycicd.py end to end against the fake docker CLI in
+tests/fakebin, so no docker daemon is needed.
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+FAKEBIN = Path(__file__).resolve().parent / 'fakebin'
+
+# Unit tests import scarycicd from the repository root
+sys.path.insert(0, str(ROOT))
+
+
+class FakeDocker:
+    """What the fake docker CLI was asked to do during a test."""
+
+    def __init__(self, state):
+        self.state = state
+
+    def calls(self, command=None):
+        """Return every docker call as an argument list, optionally of one command."""
+        log = self.state / 'calls.log'
+        if not log.exists():
+            return []
+        calls = [line.split() for line in log.read_text().splitlines()]
+        return [call for call in calls if command is None or call[0] == command]
+
+    def started(self):
+        """Return the names of the warm containers started with docker run -d."""
+        return [call[call.index('--name') + 1] for call in self.calls('run') if '-d' in call]
+
+    def exec_targets(self):
+        """Return the container of each docker exec, in order."""
+        targets = []
+        for call in self.calls('exec'):
+            args = call[1:]
+            while args[0].startswith('-'):
+                args = args[2:] if args[0] in ('-w', '-e') else args[1:]
+            targets.append(args[0])
+        return targets
+
+    def script_pids(self):
+        """Return the process ids of the scripts docker has started."""
+        return [int(path.read_text()) for path in self.state.glob('*.pid')]
+
+    def running(self):
+        """Return the names of the warm containers that were never removed."""
+        return sorted(path.stem for path in self.state.glob('*.json'))
+
+
+@pytest.fixture
+def fake_docker(tmp_path):
+    state = tmp_path / 'docker'
+    state.mkdir()
+    return FakeDocker(state)
+
+
+@pytest.fixture
+def pipeline_command(tmp_path, fake_docker):
+    """Return (argv, env) running a pipeline config with the given options."""
+
+    def command(config, *options):
+        config_file = tmp_path / 'pipeline.yml'
+        config_file.write_text(textwrap.dedent(config))
+        workspace = tmp_path / 'workspace'
+        workspace.mkdir(exist_ok=True)
+        env = dict(
+            os.environ,
+            PATH=f"{FAKEBIN}{os.pathsep}{os.environ['PATH']}",
+            FAKE_DOCKER_STATE=str(fake_docker.state),
+            XDG_CACHE_HOME=str(tmp_path / 'cache'),
+        )
+        argv = [sys.executable, str(ROOT / 'scarycicd.py'), str(config_file), str(workspace),
+                '--no-history', *options]
+        return argv, env
+
+    return command
+
+
+@pytest.fixture
+def run_pipeline(tmp_path, pipeline_command):
+    """Run a pipeline config with the given options; return the finished process."""
+
+    def run(config, *options, timeout=60):
+        argv, env = pipeline_command(config, *options)
+        return subprocess.run(argv, cwd=tmp_path, env=env, capture_output=True, text=True,
+                              timeout=timeout)
+
+    return run
@@ -0,0 +1,54 @@
+"""Artifacts are stored as blobs and handed to dependents as views (user-008/009)."""
+
+import os
+
+from scarycicd import ArtifactManager
+
+
+def test_stale_views_and_manifests_are_not_reused(tmp_path):
+    stale_view = tmp_path / '.pipeline_artifacts' / 'views' / 'build' / 'out'
+    stale_view.mkdir(parents=True)
+    (stale_view / 'app.bin').write_text('STALE')
+    stale_manifest = tmp_path / '.pipeline_artifacts' / 'manifests' / 'old.json'
+    stale_manifest.parent.mkdir(parents=True)
+    stale_manifest.write_text('{"paths": [], "files": {}}')
+    (tmp_path / 'out').mkdir()
+    (tmp_path / 'out' / 'app.bin').write_text('fresh')
+
+    manager = ArtifactManager(tmp_path)
+    manager.save_artifacts('build', ['out'])
+    _, binds = manager.load_artifacts(['build'], mount=True)
+
+    [(host_path, rel_path)] = binds
+    assert rel_path == 'out'
+    assert (host_path / 'app.bin').read_text() == 'fresh'
+    assert not stale_manifest.exists()
+
+
+def test_declared_file_is_bound_alone(tmp_path):
+    (tmp_path / 'build').mkdir()
+    (tmp_path / 'build' / 'app.bin').write_text('app')
+    (tmp_path / 'build' / 'other').write_text('other')
+
+    manager = ArtifactManager(tmp_path)
+    manager.save_artifacts('build 1/2', ['build/app.bin'])
+    count, binds = manager.load_artifacts(['build 1/2'], mount=True)
+
+    assert count == 1
+    [(host_path, rel_path)] = binds
+    assert rel_path == 'build/app.bin'
+    assert ':' not in str(host_path) and ' ' not in str(host_path)
+
+
+def test_placed_artifacts_do_not_share_the_blob(tmp_path):
+    (tmp_path / 'out').mkdir()
+    (tmp_path / 'out' / 'file').write_text('data')
+    manager = ArtifactManager(tmp_path)
+    manager.save_artifacts('build', ['out'])
+    os.unlink(tmp_path / 'out' / 'file')
+
+    manager.load_artifacts(['build'])
+    (tmp_path / 'out' / 'file').write_text('edited')
+
+    blob = manager._blob_path(manager.manifest('build')['out/file']['digest'])
+    assert blob.read_text() == 'data'
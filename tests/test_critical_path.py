@@ -0,0 +1,62 @@
+"""The needs graph gives the batches and the critical path of a run (user-001/014)."""
+
+import textwrap
+
+from scarycicd import Pipeline, critical_path
+
+
+def test_critical_path_and_slack():
+    # a -> b -> d takes 6s; a -> c -> d only 4s, so c has 2s of slack
+    dependencies = {'a': [], 'b': ['a'], 'c': ['a'], 'd': ['b', 'c']}
+    durations = {'a': 1.0, 'b': 3.0, 'c': 1.0, 'd': 2.0}
+
+    report = critical_path(['a', 'b', 'c', 'd'], dependencies, durations)
+
+    assert report['length'] == 6.0
+    assert report['path'] == ['a', 'b', 'd']
+    assert {name: info['slack'] for name, info in report['jobs'].items()} == {
+        'a': 0.0, 'b': 0.0, 'c': 2.0, 'd': 0.0,
+    }
+    assert report['jobs']['c']['earliest_start'] == 1.0
+    assert report['jobs']['c']['latest_start'] == 3.0
+
+
+def test_jobs_without_a_duration_are_left_out():
+    report = critical_path(['a', 'b'], {'a': [], 'b': ['a']}, {'b': 2.0})
+
+    assert report['path'] == ['b']
+    assert list(report['jobs']) == ['b']
+
+
+def test_dag_batches_follow_needs_and_stages(tmp_path):
+    config = tmp_path / 'pipeline.yml'
+    config.write_text(textwrap.dedent('''
+        stages: [build, test, deploy]
+        lint: {stage: build, script: ["true"]}
+        compile: {stage: build, script: ["true"]}
+        unit: {stage: test, needs: [compile], script: ["true"]}
+        e2e: {stage: test, script: ["true"]}
+        ship: {stage: deploy, needs: [unit], script: ["true"]}
+        docs: {stage: deploy, script: ["true"]}
+        package: {stage: deploy, needs: [compile], script: ["true"]}
+    '''))
+    pipeline = Pipeline(config)
+
+    batches = pipeline._dag_batches(pipeline.jobs)
+
+    # needs skip the stage barrier; jobs without needs wait for every earlier stage
+    assert [sorted(job.name for job in batch) for batch in batches] == [
+        ['compile', 'lint'], ['e2e', 'package', 'unit'], ['docs', 'ship'],
+    ]
+
+
+def test_printout_lists_only_the_least_slack(capsys):
+    jobs = {f'job {i}': {'duration': 1.0, 'slack': float(i)} for i in range(100)}
+    report = {'length': 1.0, 'path': ['job 0'], 'jobs': jobs}
+
+    Pipeline.__new__(Pipeline)._print_critical_path(report)
+
+    lines = capsys.readouterr().out.strip().splitlines()
+    assert lines[0] == 'Critical path (1.0s): job 0'
+    assert [line.split()[1] for line in lines[1:-1]] == [str(i) for i in range(Pipeline.SLACK_ROWS)]
+    assert lines[-1] == '  ... 90 more job(s); --report FILE writes them all'
@@ -0,0 +1,80 @@
+"""The job cache keys runs by their inputs and stores their artifacts (user-006)."""
+
+import os
+
+import pytest
+
+from scarycicd import JobCache
+
+
+class FakeJob:
+    def __init__(self, artifacts=(), inputs=(), name='job'):
+        self.name = name
+        self.image = 'alpine'
+        self.script = ['true']
+        self.variables = {}
+        self.artifacts = list(artifacts)
+        self.inputs = list(inputs)
+        self.needs = []
+
+
+def test_failed_store_leaves_nothing_behind(tmp_path):
+    (tmp_path / 'out').mkdir()
+    (tmp_path / 'out' / 'file').write_text('data')
+    os.symlink(tmp_path / 'missing', tmp_path / 'out' / 'dangling')
+    cache = JobCache(tmp_path)
+
+    with pytest.raises(OSError):
+        cache.store('key', FakeJob(artifacts=['out']))
+
+    assert list(cache.cache_dir.iterdir()) == []
+
+
+def test_failed_store_does_not_fail_the_job(run_pipeline):
+    result = run_pipeline('''
+        stages: [build]
+        build:
+          stage: build
+          image: alpine
+          script: ["mkdir -p out && echo x > out/file && ln -sf /missing out/dangling"]
+          artifacts:
+            paths: [out]
+    ''', '--cache')
+
+    assert result.returncode == 0, result.stdout
+    assert '[build] Cache unavailable' in result.stdout
+    assert '✓ Pipeline completed successfully!' in result.stdout
+
+
+def test_key_ignores_runner_state(tmp_path):
+    (tmp_path / 'src.txt').write_text('source')
+    cache = JobCache(tmp_path)
+    job = FakeJob(inputs=['.'])
+    key = cache.key(job, None)
+
+    (cache.cache_dir / 'entry').mkdir()
+    (cache.cache_dir / 'entry' / 'meta.json').write_text('{}')
+    (tmp_path / '.pipeline_artifacts' / 'blobs').mkdir(parents=True)
+    (tmp_path / '.pipeline_artifacts' / 'blobs' / 'blob').write_text('blob')
+    (tmp_path / 'logs').mkdir()
+    (tmp_path / 'logs' / 'job.log').write_text('output')
+    assert cache.key(job, None) == key
+
+    (tmp_path / 'src.txt').write_text('changed')
+    assert cache.key(job, None) != key
+
+
+def test_whole_workspace_as_input_hits_the_cache(run_pipeline):
+    config = '''
+        stages: [build]
+        build:
+          stage: build
+          image: alpine
+          inputs: ["."]
+          script: ["echo built"]
+    '''
+    outputs = [run_pipeline(config, '--cache').stdout for _ in range(3)]
+
+    assert 'Restored from cache' not in outputs[0]
+    assert 'Restored from cache' in outputs[1]
+    assert 'Restored from cache' in outputs[2]
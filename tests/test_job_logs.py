@@ -0,0 +1,22 @@
+"""Every job's raw output is kept in logs/ in the workspace (user-018)."""
+
+
+def test_similar_names_keep_separate_logs(tmp_path, run_pipeline, fake_docker):
+    result = run_pipeline('''
+        stages: [test]
+        build 1/2:
+          stage: test
+          image: alpine
+          script: ["echo slash"]
+        build-1-2:
+          stage: test
+          image: alpine
+          script: ["echo dash"]
+    ''')
+
+    assert result.returncode == 0, result.stdout
+    logs = sorted((tmp_path / 'workspace' / 'logs').glob('*.log'))
+    assert len(logs) == 2
+    assert sorted(log.read_text().strip() for log in logs) == ['dash', 'slash']
+    names = [call[call.index('--name') + 1] for call in fake_docker.calls('run')]
+    assert len(set(names)) == 2 and all(' ' not in name and '/' not in name for name in names)
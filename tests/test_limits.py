@@ -0,0 +1,57 @@
+"""Resource limits bound what runs at once (user-016)."""
+
+import json
+
+import pytest
+
+from scarycicd import Job, Pipeline, ResourceLimiter
+
+
+@pytest.mark.parametrize('limits', [
+    'images: {alpine: 0}',
+    'max_parallel: -1',
+    'cpu: 0',
+    'mem: 0',
+])
+def test_limits_that_admit_nothing_are_rejected(run_pipeline, limits):
+    result = run_pipeline(f'''
+        stages: [test]
+        limits:
+          {limits}
+        job:
+          stage: test
+          image: alpine
+          script: ["echo ran"]
+    ''')
+
+    assert result.returncode == 1
+    assert result.stdout.startswith('Error: limits:')
+    assert '[job] ran' not in result.stdout
+
+
+def test_jobs_never_admitted_fail_the_run():
+    pipeline = Pipeline.__new__(Pipeline)
+    pipeline.priorities = {}
+    pipeline.limiter = ResourceLimiter(4, per_image={'alpine': 0})
+    jobs = [Job('job', {'stage': 'test', 'image': 'alpine', 'script': ['true']}, {})]
+
+    results = pipeline._execute_graph(jobs, {'job': []}, worker_pool=None)
+
+    assert results == [('job', False, 'Not admitted by limits')]
+
+
+def test_plan_applies_the_limits(run_pipeline):
+    result = run_pipeline('''
+        stages: [test]
+        limits:
+          images: {alpine: 2}
+        a: {stage: test, image: alpine, script: ["true"]}
+        b: {stage: test, image: alpine, script: ["true"]}
+        c: {stage: test, image: alpine, script: ["true"]}
+        d: {stage: test, image: busybox, resource_group: db, script: ["true"]}
+        e: {stage: test, image: busybox, resource_group: db, script: ["true"]}
+    ''', '--plan-json', '--jobs', '8')
+
+    [batch] = json.loads(result.stdout)['batches']
+    # Two alpine jobs and one of the db group
+    assert batch['concurrency'] == 3
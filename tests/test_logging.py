@@ -0,0 +1,18 @@
+"""Job output reaches the coordinator as lines (user-019)."""
+
+import queue
+import threading
+
+from scarycicd import AsyncJobExecutor
+
+
+def test_async_executor_puts_lines_directly(tmp_path):
+    output_queue = queue.Queue()
+    threads = threading.active_count()
+    log = AsyncJobExecutor(tmp_path, artifact_manager=None)._logger(output_queue)
+
+    log('[job] line')
+
+    # No batch and no flusher thread: the line is there at once
+    assert output_queue.get_nowait() == '[job] line'
+    assert threading.active_count() == threads
@@ -0,0 +1,46 @@
+"""Parallel jobs expand into variants with their own variables (user-021)."""
+
+import pytest
+
+from scarycicd import Job, expand_parallel
+
+
+def test_count_gives_numbered_copies():
+    assert expand_parallel('test', 2) == [
+        ('test 1/2', {'CI_NODE_INDEX': '1', 'CI_NODE_TOTAL': '2'}),
+        ('test 2/2', {'CI_NODE_INDEX': '2', 'CI_NODE_TOTAL': '2'}),
+    ]
+
+
+def test_matrix_entries_add_the_product_of_their_lists():
+    variants = expand_parallel('test', {'matrix': [
+        {'PY': ['3.11', 3.12], 'OS': ['linux', 'alpine']},
+        {'PY': 'pypy'},
+    ]})
+
+    assert [name for name, _ in variants] == [
+        'test: [3.11, linux]', 'test: [3.11, alpine]',
+        'test: [3.12, linux]', 'test: [3.12, alpine]',
+        'test: [pypy]',
+    ]
+    assert variants[2][1] == {'PY': '3.12', 'OS': 'linux'}
+
+
+@pytest.mark.parametrize('parallel', ['3', {'matrix': {'PY': '3.12'}}, {}])
+def test_invalid_parallel_is_rejected(parallel):
+    with pytest.raises(ValueError, match="'parallel' must be"):
+        expand_parallel('test', parallel)
+
+
+def test_variants_substitute_artifact_paths_and_needs():
+    config = {'script': ['make $PY'], 'artifacts': {'paths': ['out/$PY', 'common']},
+              'needs': ['setup $PY'], 'inputs': ['src']}
+    first = Job('build: [3.11]', config, {}, {'PY': '3.11'})
+    second = Job('build: [3.12]', config, {}, {'PY': '3.12'})
+
+    assert first.artifacts == ['out/3.11', 'common']
+    assert second.artifacts == ['out/3.12', 'common']
+    assert first.needs == ['setup 3.11']
+    # Lists no substitution changes stay shared with the config
+    assert first.inputs is second.inputs is config['inputs']
+
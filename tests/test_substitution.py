@@ -0,0 +1,38 @@
+"""Variables are substituted into job fields as written in the config (user-022)."""
+
+from scarycicd import Substitution
+
+
+def test_longest_name_wins():
+    substitution = Substitution({'FOO': 'short', 'FOOBAR': 'long'})
+
+    assert substitution.apply('$FOO $FOOBAR') == 'short long'
+    assert substitution.apply('$FOOBAZ') == '$FOOBAZ'
+
+
+def test_braced_names_end_at_the_brace():
+    substitution = Substitution({'FOO': 'short', 'FOOBAR': 'long'})
+
+    assert substitution.apply('${FOO}BAR') == 'shortBAR'
+    assert substitution.apply('${FOOBAR}') == 'long'
+
+
+def test_values_may_reference_other_variables():
+    substitution = Substitution({'IMAGE': 'python:$PY', 'PY': '${MAJOR}.12', 'MAJOR': '3'})
+
+    assert substitution.apply('$IMAGE') == 'python:3.12'
+
+
+def test_unknown_and_cyclic_variables_are_left_as_written():
+    substitution = Substitution({'A': 'a$B', 'B': 'b${A}', 'SELF': '$SELF'})
+
+    assert substitution.apply('$UNKNOWN ${UNKNOWN}') == '$UNKNOWN ${UNKNOWN}'
+    assert substitution.apply('$SELF') == '$SELF'
+    assert substitution.apply('$A') == 'ab${A}'
+
+
+def test_non_strings_are_returned_unchanged():
+    substitution = Substitution({'N': '1'})
+
+    assert substitution.apply(3) == 3
+    assert substitution.apply(None) is None
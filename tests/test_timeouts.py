@@ -0,0 +1,122 @@
+"""Job timeouts are wall-clock limits enforced by a watchdog (user-005)."""
+
+import os
+import signal
+import subprocess
+import time
+
+import pytest
+
+BACKENDS = ['process', 'async']
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_silent_job_times_out(run_pipeline, fake_docker, backend):
+    start = time.monotonic()
+    result = run_pipeline('''
+        stages: [test]
+        hang:
+          stage: test
+          image: alpine
+          timeout: 1
+          script: ["sleep 30"]
+    ''', '--backend', backend)
+
+    assert result.returncode != 0
+    assert '[hang] ✗ Job timed out after 1s' in result.stdout
+    assert time.monotonic() - start < 20
+    # The container is killed, not left running
+    assert any(call[0] == 'kill' for call in fake_docker.calls())
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_chatty_job_times_out(run_pipeline, backend):
+    result = run_pipeline('''
+        stages: [test]
+        chatty:
+          stage: test
+          image: alpine
+          timeout: 1
+          script: ["while true; do echo tick; sleep 0.1; done"]
+    ''', '--backend', backend)
+
+    assert result.returncode != 0
+    assert '[chatty] tick' in result.stdout
+    assert '[chatty] ✗ Job timed out after 1s' in result.stdout
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_job_within_timeout_succeeds(run_pipeline, backend):
+    result = run_pipeline('''
+        stages: [test]
+        quick:
+          stage: test
+          image: alpine
+          timeout: 10
+          script: ["echo done"]
+    ''', '--backend', backend)
+
+    assert result.returncode == 0, result.stdout
+    assert '[quick] done' in result.stdout
+    assert 'timed out' not in result.stdout
+
+
+def test_timeout_in_warm_container_recycles_it(run_pipeline, fake_docker):
+    result = run_pipeline('''
+        stages: [test]
+        hang:
+          stage: test
+          image: alpine
+          timeout: 1
+          script: ["sleep 30"]
+    ''', '--warm')
+
+    assert result.returncode != 0
+    assert '[hang] ✗ Job timed out after 1s' in result.stdout
+    assert fake_docker.running() == []
+
+
+def alive(pid):
+    try:
+        os.killpg(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_interrupt_kills_running_containers(tmp_path, pipeline_command, fake_docker, backend):
+    argv, env = pipeline_command('''
+        stages: [test]
+        one:
+          stage: test
+          image: alpine
+          script: ["sleep 40"]
+        two:
+          stage: test
+          image: alpine
+          script: ["sleep 41"]
+    ''', '--backend', backend)
+    # Its own process group, so the interrupt reaches it like a Ctrl-C would
+    coordinator = subprocess.Popen(argv, cwd=tmp_path, env=env, start_new_session=True,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 20
+        while len(fake_docker.script_pids()) < 2 and time.monotonic() < deadline:
+            time.sleep(0.1)
+        scripts = fake_docker.script_pids()
+        assert len(scripts) == 2
+        time.sleep(0.5)
+
+        os.killpg(coordinator.pid, signal.SIGINT)
+        coordinator.wait(timeout=30)
+
+        deadline = time.monotonic() + 10
+        while any(alive(pid) for pid in scripts) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert not any(alive(pid) for pid in scripts)
+    finally:
+        coordinator.kill()
+        for pid in fake_docker.script_pids():
+            if alive(pid):
+                os.killpg(pid, signal.SIGKILL)
@@ -0,0 +1,107 @@
+"""Jobs run by docker exec in pre-started, recycled containers (user-011)."""
+
+SEQUENTIAL_JOBS = '''
+    stages: [one, two, three]
+    first:
+      stage: one
+      image: alpine
+      script: ["echo first"]
+    second:
+      stage: two
+      image: alpine
+      script: ["echo second"]
+    third:
+      stage: three
+      image: alpine
+      script: ["echo third"]
+'''
+
+
+def test_container_is_reused(run_pipeline, fake_docker):
+    result = run_pipeline(SEQUENTIAL_JOBS, '--warm', '--jobs', '1')
+
+    assert result.returncode == 0, result.stdout
+    for name in ('first', 'second', 'third'):
+        assert f'[{name}] {name}' in result.stdout
+    assert len(fake_docker.started()) == 1
+    assert fake_docker.exec_targets() == fake_docker.started() * 3
+    # No cold docker run
+    assert all('-d' in call for call in fake_docker.calls('run'))
+
+
+def test_container_is_recycled_after_max_uses(run_pipeline, fake_docker):
+    result = run_pipeline(SEQUENTIAL_JOBS, '--warm', '--warm-uses', '2', '--jobs', '1')
+
+    assert result.returncode == 0, result.stdout
+    started = fake_docker.started()
+    assert len(started) == 2
+    assert fake_docker.exec_targets() == [started[0], started[0], started[1]]
+
+
+def test_container_is_recycled_after_failure(run_pipeline, fake_docker):
+    result = run_pipeline('''
+        stages: [one, two]
+        flaky:
+          stage: one
+          image: alpine
+          allow_failure: true
+          script: ["exit 1"]
+        after:
+          stage: two
+          image: alpine
+          script: ["echo after"]
+    ''', '--warm', '--jobs', '1')
+
+    assert result.returncode == 0, result.stdout
+    started = fake_docker.started()
+    assert len(started) == 2
+    assert fake_docker.exec_targets() == started
+
+
+def test_containers_per_image_and_resources(run_pipeline, fake_docker):
+    result = run_pipeline('''
+        stages: [one, two, three]
+        plain:
+          stage: one
+          image: alpine
+          script: ["echo plain"]
+        limited:
+          stage: two
+          image: alpine
+          resources: {cpu: 2, mem: 1G}
+          script: ["echo limited"]
+        other:
+          stage: three
+          image: busybox
+          script: ["echo other"]
+    ''', '--warm', '--jobs', '1')
+
+    assert result.returncode == 0, result.stdout
+    runs = [call for call in fake_docker.calls('run') if '-d' in call]
+    assert len(runs) == 3
+    assert [call[call.index('--cpus') + 1] for call in runs if '--cpus' in call] == ['2']
+
+
+def test_containers_are_labelled_and_removed(run_pipeline, fake_docker):
+    result = run_pipeline(SEQUENTIAL_JOBS, '--warm', '--warm-uses', '2')
+
+    assert result.returncode == 0, result.stdout
+    labels = {call[call.index('--label') + 1] for call in fake_docker.calls('run')}
+    assert len(labels) == 1
+    assert labels.pop().startswith('scarycicd.run=')
+    assert fake_docker.calls('ps')
+    assert fake_docker.running() == []
+
+
+def test_containers_are_removed_after_failed_run(run_pipeline, fake_docker):
+    result = run_pipeline('''
+        stages: [test]
+        broken:
+          stage: test
+          image: alpine
+          script: ["exit 3"]
+    ''', '--warm')
+
+    assert result.returncode != 0
+    assert fake_docker.started()
+    assert fake_docker.running() == []